@@ -1,19 +1,60 @@
+import time
 import sqlite3
 import functools
-from datetime import datetime
+import itertools
+
+from queries import JSONFormatter, fingerprint, logger, start_query_logging
 
 #### decorator to lof SQL queries
 
 
-def log_queries(func):
-    """Logs queries from database"""
+def log_queries(func=None, *, sample_rate=1, slow_ms=None):
+    """
+    Logs queries from database
+
+    Each record holds the query fingerprint, the execution time and the
+    number of rows returned. Only every ``sample_rate``-th call is logged
+    (0 logs none), except that calls slower than ``slow_ms`` and calls that
+    raise are always logged. Records are written by a background thread,
+    see start_query_logging.
+    """
+
+    def decorator(func):
+        calls = itertools.count()
+
+        @functools.wraps(func)
+        def wrapper(query, *args, **kwargs):
+            started = time.perf_counter()
+            result = error = None
+            try:
+                result = func(query, *args, **kwargs)
+                return result
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                sampled = sample_rate and next(calls) % sample_rate == 0
+                slow = slow_ms is not None and elapsed_ms >= slow_ms
+                if sampled or slow or error is not None:
+                    start_query_logging()
+                    record = {
+                        "fingerprint": fingerprint(query),
+                        "elapsed_ms": round(elapsed_ms, 3),
+                        "slow": slow,
+                    }
+                    if error is None:
+                        if isinstance(result, (list, tuple)):
+                            record["rows"] = len(result)
+                    else:
+                        record["error"] = repr(error)
+                    logger.info("query", extra={"query": record})
 
-    @functools.wraps(func)
-    def wrapper(query, *args, **kwargs):
-        print(f"{datetime.now()} - Query executed: {query}")
-        return func(query, *args, **kwargs)
+        return wrapper
 
-    return wrapper
+    if func is not None:
+        return decorator(func)
+    return decorator
 
 
 @log_queries
@@ -1,18 +1,176 @@
+import time
 import sqlite3
 import functools
+import threading
 
 
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(db_path, *args, **kwargs):
-        conn = sqlite3.connect(db_path)
+# Applied to every pooled connection when it is opened
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
+
+class ConnectionPool:
+    """
+    A pool of sqlite3 connections to one database file.
+
+    Opens at most ``max_size`` connections, each set up with PRAGMAS and a
+    prepared-statement cache of ``statement_cache_size`` entries that
+    survives between calls. A connection is only ever used by one thread
+    at a time, and a thread gets back the connection it used last when it
+    is idle, so its caches stay warm. Connections idle for longer than
+    ``idle_timeout`` seconds are closed.
+    """
+
+    def __init__(
+        self,
+        db_path,
+        max_size=8,
+        idle_timeout=300,
+        timeout=30,
+        pragmas=PRAGMAS,
+        statement_cache_size=256,
+    ):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.pragmas = pragmas
+        self.statement_cache_size = statement_cache_size
+        self._idle = []  # (connection, last thread id, last used)
+        self._size = 0
+        self._condition = threading.Condition()
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size,
+        )
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        return conn
+
+    def _evict_idle(self, now):
+        """Closes connections idle for too long; called with the lock held"""
+        keep = []
+        for conn, owner, last_used in self._idle:
+            if now - last_used >= self.idle_timeout:
+                conn.close()
+                self._size -= 1
+            else:
+                keep.append((conn, owner, last_used))
+        self._idle = keep
+
+    def acquire(self):
+        """Borrows a connection, preferring the one this thread used last"""
+        thread_id = threading.get_ident()
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._evict_idle(now)
+                if self._idle:
+                    owners = [owner for _, owner, _ in self._idle]
+                    if thread_id in owners:
+                        index = owners.index(thread_id)
+                    else:
+                        index = len(owners) - 1
+                    return self._idle.pop(index)[0]
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                if now >= deadline:
+                    raise sqlite3.OperationalError(
+                        f"No connection to {self.db_path} available"
+                    )
+                self._condition.wait(deadline - now)
+        try:
+            return self._open()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, conn):
+        """Takes a connection back, rolling back anything left uncommitted"""
         try:
-            result = func(conn, *args, **kwargs)
-        finally:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
             conn.close()
-        return result
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            return
+        with self._condition:
+            self._idle.append((conn, threading.get_ident(), time.monotonic()))
+            self._condition.notify()
+
+    def close(self):
+        """Closes every idle connection"""
+        with self._condition:
+            for conn, _, _ in self._idle:
+                conn.close()
+            self._size -= len(self._idle)
+            self._idle = []
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path, **options):
+    """
+    Returns the shared pool for ``db_path``, creating it on first use.
+
+    Pools are shared per database and set of options, so callers asking
+    for different settings get different pools.
+    """
+    key = (db_path, tuple(sorted(options.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_path, **options)
+        return pool
+
+
+def with_db_connection(func=None, *, pooled=False, **pool_options):
+    """
+    Opens a connection to ``db_path`` for the call and closes it afterwards.
+
+    With ``@with_db_connection(pooled=True, ...)`` the connection is
+    borrowed from the shared pool of that database instead (see
+    ConnectionPool for the options) and handed back after the call.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(db_path, *args, **kwargs):
+            if pooled:
+                pool = get_pool(db_path, **pool_options)
+                conn = pool.acquire()
+                try:
+                    return func(conn, *args, **kwargs)
+                finally:
+                    pool.release(conn)
+
+            conn = sqlite3.connect(db_path)
+            try:
+                result = func(conn, *args, **kwargs)
+            finally:
+                conn.close()
+            return result
+
+        return wrapper
 
-    return wrapper
+    if func is not None:
+        return decorator(func)
+    return decorator
 
 
 @with_db_connection
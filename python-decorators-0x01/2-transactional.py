@@ -1,5 +1,10 @@
+import time
+import queue
 import sqlite3
 import functools
+import itertools
+import threading
+from concurrent.futures import Future
 
 
 def with_db_connection(func):
@@ -15,18 +20,168 @@ def with_db_connection(func):
     return wrapper
 
 
-def transactional(func):
-    @functools.wraps(func)
-    def wrapper():
+_savepoint_ids = itertools.count(1)
+
+
+def transactional(func=None, *, immediate=False):
+    """
+    Commits the call if it succeeds and rolls it back if it raises.
+
+    A call made while a transaction is already open runs in a savepoint
+    instead, so only its own changes are undone on failure. With
+    ``immediate=True`` the transaction starts with BEGIN IMMEDIATE, taking
+    the write lock up front rather than upgrading a read lock later, which
+    is where concurrent SQLite writers deadlock.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(conn, *args, **kwargs):
+            if conn.in_transaction:
+                savepoint = f"sp_{next(_savepoint_ids)}"
+                conn.execute(f"SAVEPOINT {savepoint}")
+                try:
+                    result = func(conn, *args, **kwargs)
+                except Exception:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+                    raise
+                conn.execute(f"RELEASE {savepoint}")
+                return result
+
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                result = func(conn, *args, **kwargs)
+                conn.commit()
+                return result
+            except Exception as e:
+                conn.rollback()
+                raise e
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+class GroupCommitter:
+    """
+    Runs writes from many callers in shared transactions.
+
+    A single writer thread owns the connection to ``db_path``. It collects
+    submitted calls until it has ``max_batch`` of them or ``max_delay``
+    seconds have passed since the first, runs them all inside one
+    BEGIN IMMEDIATE transaction and commits once. Each call runs in its own
+    savepoint, so a failing call is rolled back without affecting the rest
+    of its group.
+    """
+
+    _STOP = object()
+
+    def __init__(self, db_path, max_batch=500, max_delay=0.005):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.calls = 0
+        self.commits = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        """Queues ``func(conn, *args, **kwargs)``; returns a Future of its result"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Cannot submit to a closed GroupCommitter")
+            self._queue.put((future, func, args, kwargs))
+        return future
+
+    def close(self):
+        """Flushes what is queued and stops the writer thread"""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(self._STOP)
+        self._thread.join()
+
+    def _next_batch(self):
+        item = self._queue.get()
+        if item is self._STOP:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path)
         try:
-            result = func(conn, *args, **kwargs)
+            stopping = False
+            while not stopping:
+                batch, stopping = self._next_batch()
+                if batch:
+                    self._commit(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit(self, conn, batch):
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for future, func, args, kwargs in batch:
+                conn.execute("SAVEPOINT call")
+                try:
+                    outcomes.append((future, func(conn, *args, **kwargs), None))
+                    conn.execute("RELEASE call")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO call")
+                    conn.execute("RELEASE call")
+                    outcomes.append((future, None, e))
             conn.commit()
-            return result
         except Exception as e:
-            conn.rollback()
-            raise e
+            if conn.in_transaction:
+                conn.rollback()
+            for future, *_ in batch:
+                future.set_exception(e)
+            return
+        self.calls += len(batch)
+        self.commits += 1
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
 
-    return wrapper
+
+def group_commit(committer):
+    """
+    Sends calls to ``committer`` instead of running them on a connection.
+
+    The decorated function takes the connection as its first argument like
+    any other; callers leave it out and block until the group their call
+    was part of has been committed.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return committer.submit(func, *args, **kwargs).result()
+
+        return wrapper
+
+    return decorator
 
 
 @with_db_connection
@@ -36,6 +191,31 @@ def update_user_email(conn, user_id, new_email):
     cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
 
 
+@with_db_connection
+@transactional(immediate=True)
+def bulk_update_user_emails(conn, updates, chunk_size=500):
+    """
+    Updates the emails of many users in a single transaction.
+
+    ``updates`` is any iterable of ``(user_id, new_email)`` pairs. It is
+    consumed ``chunk_size`` pairs at a time and each chunk is sent with one
+    executemany call. Returns the number of rows updated by each chunk.
+    """
+    cursor = conn.cursor()
+    updates = iter(updates)
+    counts = []
+    while True:
+        chunk = list(itertools.islice(updates, chunk_size))
+        if not chunk:
+            break
+        cursor.executemany(
+            "UPDATE users SET email = ? WHERE id = ?",
+            [(new_email, user_id) for user_id, new_email in chunk],
+        )
+        counts.append(cursor.rowcount)
+    return counts
+
+
 #### Update user's email with automatic transaction handling
 
 update_user_email(user_id=1, new_email="Crawford_Cartwright@hotmail.com")
@@ -1,6 +1,12 @@
 import time
+import random
+import asyncio
+import inspect
 import sqlite3
 import functools
+import threading
+
+from queries import TRANSIENT_MESSAGES, is_transient
 
 
 def with_db_connection(func):
@@ -16,20 +22,150 @@ def with_db_connection(func):
     return wrapper
 
 
-def retry_on_failure(retries=3, delay=2):
+class CircuitOpenError(sqlite3.OperationalError):
+    """Raised instead of calling through while the retry circuit is open"""
+
+
+class RetryBudget:
+    """
+    Limits retries across the whole process.
+
+    Every call adds ``ratio`` of a token (up to ``max_tokens``) and every
+    retry spends one, so retries stay a small fraction of the traffic during
+    an outage instead of multiplying it. After ``failure_threshold`` calls
+    in a row have given up, the circuit opens and calls fail fast with
+    CircuitOpenError for ``cooldown`` seconds.
+    """
+
+    def __init__(self, ratio=0.1, max_tokens=10, failure_threshold=5, cooldown=30):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._tokens = max_tokens
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+        self.counters = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "successes": 0,
+            "give_ups": 0,
+            "budget_exhausted": 0,
+            "rejected": 0,
+        }
+
+    def start_call(self):
+        """Registers a new call, failing fast if the circuit is open"""
+        with self._lock:
+            if time.monotonic() < self._open_until:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError("Too many failed calls, circuit is open")
+            self.counters["calls"] += 1
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def attempt(self):
+        with self._lock:
+            self.counters["attempts"] += 1
+
+    def spend_retry(self):
+        """Takes a token for a retry; returns False when none are left"""
+        with self._lock:
+            if self._tokens < 1:
+                self.counters["budget_exhausted"] += 1
+                return False
+            self._tokens -= 1
+            self.counters["retries"] += 1
+            return True
+
+    def succeeded(self):
+        with self._lock:
+            self.counters["successes"] += 1
+            self._failures = 0
+
+    def gave_up(self):
+        with self._lock:
+            self.counters["give_ups"] += 1
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self.cooldown
+                self._failures = 0
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, tokens=self._tokens)
+
+
+retry_budget = RetryBudget()
+
+
+def retry_on_failure(
+    retries=3, delay=2, max_delay=30, retry_on=is_transient, budget=None
+):
+    """
+    Retries a call that fails with a transient error.
+
+    Waits a random time between 0 and ``delay * 2 ** (attempt - 1)`` seconds
+    (capped at ``max_delay``) between attempts, so workers that failed
+    together do not retry together. Errors for which ``retry_on`` is false
+    are raised straight away. Retries draw on ``budget`` (the process-wide
+    retry_budget by default). Coroutine functions are awaited and back off
+    with asyncio.sleep instead of blocking the thread.
+    """
+
     def decorator(func):
+        def backoff(store, attempts, error):
+            """Seconds to wait before the next attempt, or None to give up"""
+            print(f"Attempt {attempts} failed: {error}")
+            if not retry_on(error):
+                return None
+            if attempts >= retries or not store.spend_retry():
+                store.gave_up()
+                return None
+            return random.uniform(0, min(max_delay, delay * 2 ** (attempts - 1)))
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                store = retry_budget if budget is None else budget
+                store.start_call()
+                attempts = 0
+                while True:
+                    attempts += 1
+                    store.attempt()
+                    try:
+                        result = await func(*args, **kwargs)
+                    except Exception as e:
+                        pause = backoff(store, attempts, e)
+                        if pause is None:
+                            raise  # Re-raise the last exception
+                        await asyncio.sleep(pause)
+                    else:
+                        store.succeeded()
+                        return result
+
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
+            store = retry_budget if budget is None else budget
+            store.start_call()
             attempts = 0
-            while attempts < retries:
+            while True:
+                attempts += 1
+                store.attempt()
                 try:
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
                 except Exception as e:
-                    attempts += 1
-                    print(f"Attempt {attempts} failed: {e}")
-                    if attempts == retries:
+                    pause = backoff(store, attempts, e)
+                    if pause is None:
                         raise  # Re-raise the last exception
-                    time.sleep(delay)
+                    time.sleep(pause)
+                else:
+                    store.succeeded()
+                    return result
 
         return wrapper
 
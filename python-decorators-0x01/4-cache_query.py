@@ -1,9 +1,167 @@
 import time
+import threading
 import sqlite3
 import functools
+from collections import OrderedDict
 
+from queries import READ_QUERY, tables_in
 
-query_cache = {}
+
+class QueryCache:
+    """
+    A bounded, thread-safe cache of query results.
+
+    Holds at most ``maxsize`` results and drops the least recently used one
+    when full. Each result expires ``ttl`` seconds after it was stored, and
+    is tagged with the tables its query read so writes to those tables can
+    invalidate it.
+
+    get_or_load() lets only one caller run a missing query while concurrent
+    callers for the same key wait for its result. For ``stale_ttl`` seconds
+    after an entry expires, one caller refreshes it while everyone else is
+    served the stale result instead of waiting. Each table has a generation
+    that invalidate() bumps; a load that a write overlapped is returned to
+    its caller but not stored, since it may predate the write.
+    """
+
+    def __init__(self, maxsize=256, ttl=300, stale_ttl=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.shared_loads = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _lookup(self, key, now):
+        """Returns ``(entry, fresh)``; called with the lock held"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+        expires = entry[0]
+        if expires > now:
+            self._entries.move_to_end(key)
+            return entry, True
+        if expires + self.stale_ttl > now:
+            return entry, False
+        del self._entries[key]
+        self.expirations += 1
+        return None, False
+
+    def get(self, key):
+        """Returns ``(True, result)`` for a live entry, else ``(False, None)``"""
+        with self._lock:
+            entry, fresh = self._lookup(key, time.monotonic())
+            if fresh:
+                self.hits += 1
+                return True, entry[2]
+            self.misses += 1
+            return False, None
+
+    def _generation(self, tables):
+        """Generations of ``tables``; called with the lock held"""
+        return tuple(self._generations.get(table, 0) for table in sorted(tables))
+
+    def _store(self, key, result, tables, ttl):
+        """Stores a result; called with the lock held"""
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires, tables, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def set(self, key, result, tables=frozenset(), ttl=None):
+        """Stores a result, evicting the least recently used ones if full"""
+        with self._lock:
+            self._store(key, result, tables, ttl)
+
+    def get_or_load(self, key, load, tables=frozenset(), ttl=None):
+        """
+        Returns the cached result for ``key``, calling ``load()`` on a miss.
+
+        Returns ``(result, loaded)`` where ``loaded`` tells whether this
+        caller ran ``load()`` itself.
+        """
+        while True:
+            with self._lock:
+                entry, fresh = self._lookup(key, time.monotonic())
+                if fresh:
+                    self.hits += 1
+                    return entry[2], False
+                waiting = self._in_flight.get(key)
+                if waiting is not None and entry is not None:
+                    self.stale_hits += 1
+                    return entry[2], False
+                if waiting is None:
+                    self.misses += 1
+                    done = self._in_flight[key] = threading.Event()
+                    generation = self._generation(tables)
+            if waiting is None:
+                break
+            waiting.wait()
+            with self._lock:
+                entry, fresh = self._lookup(key, time.monotonic())
+                if entry is not None:
+                    self.shared_loads += 1
+                    return entry[2], False
+            # the load we waited on failed or was overtaken by a write;
+            # try to run it ourselves
+
+        try:
+            result = load()
+            with self._lock:
+                if self._generation(tables) == generation:
+                    self._store(key, result, tables, ttl)
+                else:
+                    self.invalidations += 1
+            return result, True
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            done.set()
+
+    def invalidate(self, tables):
+        """Drops every cached result that read one of ``tables``"""
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            stale = [
+                key
+                for key, (_, tagged, _) in self._entries.items()
+                if tagged & tables
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "in_flight": len(self._in_flight),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "shared_loads": self.shared_loads,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+query_cache = QueryCache()
 
 
 def with_db_connection(func):
@@ -19,18 +177,48 @@ def with_db_connection(func):
     return wrapper
 
 
-def cache_query(func):
-    @functools.wraps(func)
-    def wrapper(conn, query, *args, **kwargs):
-        if query in query_cache:
-            print("Using cached result for query:", query)
-            return query_cache[query]
-        # Execute the function and cache the result
-        result = func(conn, query, *args, **kwargs)
-        query_cache[query] = result
-        return result
+def cache_query(func=None, *, cache=None, ttl=None):
+    """
+    Caches the results of read queries, keyed on the query and its parameters.
 
-    return wrapper
+    Writes (anything other than SELECT/WITH/PRAGMA/EXPLAIN) are never cached;
+    they run and then invalidate the cached results of the tables they
+    touch. Concurrent misses for the same key run the query only once (see
+    QueryCache.get_or_load). Can be used bare or as
+    ``@cache_query(cache=..., ttl=...)``.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(conn, query, *args, **kwargs):
+            store = query_cache if cache is None else cache
+            if not READ_QUERY.match(query):
+                result = func(conn, query, *args, **kwargs)
+                store.invalidate(tables_in(query))
+                return result
+
+            key = (query, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:  # unhashable parameters, run uncached
+                return func(conn, query, *args, **kwargs)
+
+            # Execute the function on a miss; concurrent misses share one run
+            result, loaded = store.get_or_load(
+                key,
+                lambda: func(conn, query, *args, **kwargs),
+                tables_in(query),
+                ttl,
+            )
+            if not loaded:
+                print("Using cached result for query:", query)
+            return result
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
 
 
 @with_db_connection
@@ -0,0 +1,229 @@
+import json
+import math
+import inspect
+import time
+import sqlite3
+import functools
+import threading
+
+from queries import fingerprint
+
+_context = threading.local()
+
+
+class LatencyHistogram:
+    """
+    A fixed-size latency histogram with logarithmic buckets.
+
+    Buckets grow by a factor of 2 ** (1 / 4) from 1 microsecond, so
+    quantiles are accurate to within about 19% at any scale while memory
+    stays constant however many values are recorded.
+    """
+
+    GROWTH = 2 ** 0.25
+    SMALLEST = 1e-6
+    BUCKETS = 128
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        if seconds <= self.SMALLEST:
+            index = 0
+        else:
+            index = int(math.log(seconds / self.SMALLEST, self.GROWTH)) + 1
+        self.counts[min(index, self.BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile, in seconds"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.SMALLEST * self.GROWTH ** index, self.max)
+        return self.max
+
+
+class QueryStats:
+    """What the registry knows about one query fingerprint"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.connection_wait = LatencyHistogram()
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.plan = None
+
+    def snapshot(self):
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 3)
+
+        latency = self.latency
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "mean_ms": ms(latency.total / latency.count if latency.count else None),
+            "p50_ms": ms(latency.quantile(0.5)),
+            "p95_ms": ms(latency.quantile(0.95)),
+            "p99_ms": ms(latency.quantile(0.99)),
+            "max_ms": ms(latency.max),
+            "connection_wait_ms": ms(self.connection_wait.total),
+            "connection_wait_p95_ms": ms(self.connection_wait.quantile(0.95)),
+            "plan": self.plan,
+        }
+
+
+class QueryRegistry:
+    """Thread-safe per-fingerprint query statistics for this process"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, query, seconds, rows=None, error=False, connection_wait=None):
+        key = fingerprint(query)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = QueryStats()
+            stats.calls += 1
+            stats.latency.record(seconds)
+            if error:
+                stats.errors += 1
+            if rows:
+                stats.rows += rows
+            if connection_wait is not None:
+                stats.connection_wait.record(connection_wait)
+
+    def record_plan(self, query, plan):
+        with self._lock:
+            stats = self._stats.get(fingerprint(query))
+            if stats is not None:
+                stats.plan = plan
+
+    def snapshot(self):
+        """Returns the statistics of every fingerprint, busiest first"""
+        with self._lock:
+            snapshot = {key: stats.snapshot() for key, stats in self._stats.items()}
+        return dict(
+            sorted(
+                snapshot.items(),
+                key=lambda item: item[1]["calls"] * (item[1]["mean_ms"] or 0),
+                reverse=True,
+            )
+        )
+
+    def export(self, path):
+        """Writes the snapshot to ``path`` as JSON"""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.snapshot(), file, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+registry = QueryRegistry()
+
+
+def with_db_connection(func):
+    @functools.wraps(func)
+    def wrapper(db_path, *args, **kwargs):
+        started = time.perf_counter()
+        conn = sqlite3.connect(db_path)
+        _context.connection_wait = time.perf_counter() - started
+        try:
+            result = func(conn, *args, **kwargs)
+        finally:
+            conn.close()
+        return result
+
+    return wrapper
+
+
+def profile_queries(func=None, *, slow_ms=None, explain=True, target=None):
+    """
+    Records the latency, rows returned and connection wait of each call.
+
+    Wraps functions called as ``func(conn, query, params...)`` and files
+    the measurements under the query's fingerprint in ``target`` (the
+    module-level registry by default). When a call takes ``slow_ms`` or
+    longer and ``explain`` is set, the query's EXPLAIN QUERY PLAN is
+    captured alongside its statistics.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def params_of(conn, query, args, kwargs):
+            """The query parameters of a call, however they were passed"""
+            bound = signature.bind(conn, query, *args, **kwargs)
+            bound.apply_defaults()
+            parameters = list(signature.parameters.values())
+            if len(parameters) < 3:
+                return ()
+            value = bound.arguments.get(parameters[2].name, ())
+            if parameters[2].kind is inspect.Parameter.VAR_POSITIONAL:
+                return value[0] if value else ()
+            return value
+
+        @functools.wraps(func)
+        def wrapper(conn, query, *args, **kwargs):
+            store = registry if target is None else target
+            connection_wait = getattr(_context, "connection_wait", None)
+            _context.connection_wait = None
+            started = time.perf_counter()
+            try:
+                result = func(conn, query, *args, **kwargs)
+            except Exception:
+                store.record(
+                    query,
+                    time.perf_counter() - started,
+                    error=True,
+                    connection_wait=connection_wait,
+                )
+                raise
+            elapsed = time.perf_counter() - started
+            rows = len(result) if isinstance(result, (list, tuple)) else None
+            store.record(query, elapsed, rows, connection_wait=connection_wait)
+            if explain and slow_ms is not None and elapsed * 1000 >= slow_ms:
+                try:
+                    params = params_of(conn, query, args, kwargs)
+                    plan = conn.execute(f"EXPLAIN QUERY PLAN {query}", params)
+                    store.record_plan(query, [row[-1] for row in plan.fetchall()])
+                except sqlite3.Error:
+                    pass
+            return result
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+@with_db_connection
+@profile_queries(slow_ms=1)
+def fetch_users(conn, query, params=()):
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+
+if __name__ == "__main__":
+    #### profile a few queries and print what the registry saw
+    for user_id in range(1, 4):
+        fetch_users("users.db", "SELECT * FROM users WHERE id = ?", (user_id,))
+    fetch_users("users.db", "SELECT * FROM users")
+    print(json.dumps(registry.snapshot(), indent=2))
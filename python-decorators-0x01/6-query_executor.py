@@ -0,0 +1,403 @@
+import os
+import time
+import random
+import sqlite3
+import tempfile
+import functools
+import itertools
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from queries import (
+    READ_QUERY,
+    fingerprint,
+    is_transient,
+    logger,
+    start_query_logging,
+    tables_in,
+)
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",
+)
+
+
+@functools.lru_cache(maxsize=1024)
+def plan_query(query):
+    """Returns ``(is_read, tables, fingerprint)`` for a query"""
+    return bool(READ_QUERY.match(query)), tables_in(query), fingerprint(query)
+
+
+def cache_key(query, params):
+    """The cache key of a call, or None when its params are unhashable"""
+    if isinstance(params, Mapping):
+        key = (query, tuple(sorted(params.items())))
+    else:
+        key = (query, tuple(params))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class QueryExecutor:
+    """
+    Runs queries against one SQLite database under a fixed set of policies.
+
+    Does in a single call what with_db_connection, transactional,
+    retry_on_failure, cache_query and log_queries do when stacked, without
+    a wrapper frame per concern:
+
+    - connection: each thread keeps one connection, opened with PRAGMAS
+      in autocommit mode, for the life of the executor.
+    - ``transaction``: None runs each statement on its own; "deferred" or
+      "immediate" wraps writes in BEGIN [IMMEDIATE] ... COMMIT and rolls
+      back on error.
+    - ``retries``: transient errors are retried up to that many times with
+      full-jitter backoff starting at ``delay`` seconds.
+    - ``cache_size``: up to that many read results are kept for ``ttl``
+      seconds; a write drops the results of the tables it touches, and a
+      read that a write overlapped is returned but not cached.
+    - ``log_sample_rate``/``slow_ms``: every n-th call (0 for none), every
+      call slower than ``slow_ms`` and every failed call is logged to the
+      "queries" logger, through the same background thread as log_queries
+      (see start_query_logging). Cache hits count as calls and are logged
+      with ``"cached": True``.
+
+    Everything derived from the query text (read or write, tables,
+    fingerprint) is worked out once per distinct query and reused (see
+    plan_query).
+    """
+
+    def __init__(
+        self,
+        db_path,
+        *,
+        transaction=None,
+        retries=0,
+        delay=0.05,
+        max_delay=1.0,
+        retry_on=is_transient,
+        cache_size=0,
+        ttl=300,
+        log_sample_rate=0,
+        slow_ms=None,
+        pragmas=PRAGMAS,
+    ):
+        if transaction not in (None, "deferred", "immediate"):
+            raise ValueError(f"Unknown transaction mode: {transaction!r}")
+        self.db_path = db_path
+        self.begin = transaction and f"BEGIN {transaction.upper()}"
+        self.retries = retries
+        self.delay = delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.log_sample_rate = log_sample_rate
+        self.slow_ms = slow_ms
+        self.pragmas = pragmas
+        self._cache = OrderedDict()  # (query, params) -> (expires, tables, rows)
+        self._generations = {}  # table -> number of writes that invalidated it
+        self._cache_lock = threading.Lock()
+        self._calls = itertools.count()
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def _connect(self):
+        # Only this thread uses the connection, but close() may run anywhere
+        conn = sqlite3.connect(
+            self.db_path,
+            isolation_level=None,
+            cached_statements=256,
+            check_same_thread=False,
+        )
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        self._local.conn = conn
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    def execute(self, query, params=(), many=False):
+        """
+        Runs ``query`` and returns its rows, or the row count for a write.
+
+        With ``many=True`` the query is run once per item of ``params``.
+        Reads whose params cannot be hashed are never cached.
+        """
+        is_read, tables, fingerprint = plan_query(query)
+        logged = self.log_sample_rate or self.slow_ms is not None
+        started = time.perf_counter()
+        cached = is_read and self.cache_size and not many
+        if cached:
+            key = cache_key(query, params)
+            cached = key is not None
+        if cached:
+            with self._cache_lock:
+                entry = self._cache.get(key)
+                if entry is not None:
+                    if entry[0] > time.monotonic():
+                        self._cache.move_to_end(key)
+                    else:
+                        del self._cache[key]
+                        entry = None
+                generation = self._generation(tables)
+            if entry is not None:
+                if logged:
+                    self._log(fingerprint, started, 0, result=entry[2], cached=True)
+                return entry[2]
+
+        if many:
+            params = list(params)  # a retry must see every row again
+        conn = getattr(self._local, "conn", None) or self._connect()
+        begin = None if is_read or conn.in_transaction else self.begin
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                if begin:
+                    conn.execute(begin)
+                if many:
+                    cursor = conn.executemany(query, params)
+                else:
+                    cursor = conn.execute(query, params)
+                result = cursor.fetchall() if is_read else cursor.rowcount
+                if begin:
+                    conn.execute("COMMIT")
+                break
+            except Exception as e:
+                if begin and conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                if attempts > self.retries or not self.retry_on(e):
+                    self._log(fingerprint, started, attempts, error=e)
+                    raise
+                pause = self.delay * 2 ** (attempts - 1)
+                time.sleep(random.uniform(0, min(self.max_delay, pause)))
+
+        if logged:
+            self._log(fingerprint, started, attempts, result=result)
+        if cached:
+            with self._cache_lock:
+                # a write that landed while the read ran may not be in result
+                if self._generation(tables) == generation:
+                    self._cache[key] = (time.monotonic() + self.ttl, tables, result)
+                    if len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        elif not is_read and self.cache_size and tables:
+            self.invalidate(tables)
+        return result
+
+    __call__ = execute
+
+    def _log(
+        self, fingerprint, started, attempts, result=None, error=None, cached=False
+    ):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        rate = self.log_sample_rate
+        sampled = rate and next(self._calls) % rate == 0
+        slow = self.slow_ms is not None and elapsed_ms >= self.slow_ms
+        if not (sampled or slow or error is not None):
+            return
+        record = {
+            "fingerprint": fingerprint,
+            "elapsed_ms": round(elapsed_ms, 3),
+            "slow": slow,
+            "attempts": attempts,
+        }
+        if cached:
+            record["cached"] = True
+        if error is not None:
+            record["error"] = repr(error)
+        elif isinstance(result, list):
+            record["rows"] = len(result)
+        else:
+            record["rowcount"] = result
+        start_query_logging()
+        logger.info("query", extra={"query": record})
+
+    def _generation(self, tables):
+        """Generations of ``tables``; called with the cache lock held"""
+        return tuple(self._generations.get(table, 0) for table in sorted(tables))
+
+    def invalidate(self, tables):
+        """Drops every cached result that read one of ``tables``"""
+        with self._cache_lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            stale = [key for key, entry in self._cache.items() if entry[1] & tables]
+            for key in stale:
+                del self._cache[key]
+
+    def close(self):
+        """Closes the connections of every thread"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+def _stacked_decorators(db_path):
+    """
+    The same policies as a decorator stack, one wrapper per concern.
+
+    Mirrors with_db_connection (keeping one connection per thread, like
+    the executor), log_queries, retry_on_failure, cache_query and
+    transactional from the neighbouring files.
+    """
+    local = threading.local()
+    cache = OrderedDict()
+    cache_lock = threading.Lock()
+    calls = itertools.count()
+
+    def with_db_connection(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            conn = getattr(local, "conn", None)
+            if conn is None:
+                conn = local.conn = sqlite3.connect(db_path, isolation_level=None)
+                for pragma in PRAGMAS:
+                    conn.execute(pragma)
+            return func(conn, *args, **kwargs)
+
+        return wrapper
+
+    def log_queries(func):
+        @functools.wraps(func)
+        def wrapper(conn, query, *args, **kwargs):
+            started = time.perf_counter()
+            result = func(conn, query, *args, **kwargs)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if next(calls) % 1000 == 0:
+                logger.info("query", extra={"query": {"elapsed_ms": elapsed_ms}})
+            return result
+
+        return wrapper
+
+    def retry_on_failure(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            attempts = 0
+            while True:
+                attempts += 1
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    if attempts > 3 or not is_transient(e):
+                        raise
+                    time.sleep(random.uniform(0, 0.05 * 2 ** (attempts - 1)))
+
+        return wrapper
+
+    def cache_query(func):
+        @functools.wraps(func)
+        def wrapper(conn, query, *args, **kwargs):
+            if not READ_QUERY.match(query):
+                return func(conn, query, *args, **kwargs)
+            key = (query, args)
+            with cache_lock:
+                entry = cache.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    cache.move_to_end(key)
+                    return entry[1]
+            result = func(conn, query, *args, **kwargs)
+            with cache_lock:
+                cache[key] = (time.monotonic() + 300, result)
+                if len(cache) > 256:
+                    cache.popitem(last=False)
+            return result
+
+        return wrapper
+
+    def transactional(func):
+        @functools.wraps(func)
+        def wrapper(conn, query, *args, **kwargs):
+            if READ_QUERY.match(query):
+                return func(conn, query, *args, **kwargs)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(conn, query, *args, **kwargs)
+                conn.execute("COMMIT")
+                return result
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        return wrapper
+
+    def execute(conn, query, params=()):
+        cursor = conn.execute(query, params)
+        return cursor.fetchall() if READ_QUERY.match(query) else cursor.rowcount
+
+    uncached = with_db_connection(
+        log_queries(retry_on_failure(transactional(execute)))
+    )
+    cached = with_db_connection(
+        log_queries(retry_on_failure(cache_query(transactional(execute))))
+    )
+    return uncached, cached
+
+
+def _time_per_call(call, args_for, calls):
+    started = time.perf_counter()
+    for i in range(calls):
+        call(*args_for(i))
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def benchmark(calls=20000, rounds=5):
+    """
+    Compares the per-call time of QueryExecutor with the decorator stack.
+
+    Runs a point read, a cached read and a single-row update against a
+    throwaway database and prints the best of ``rounds`` runs of ``calls``
+    calls each, in microseconds per call.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "bench.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+        conn.executemany(
+            "INSERT INTO users VALUES (?, ?)",
+            ((i, f"user{i}@example.com") for i in range(1000)),
+        )
+        conn.commit()
+        conn.close()
+
+        read = "SELECT * FROM users WHERE id = ?"
+        write = "UPDATE users SET email = ? WHERE id = ?"
+        policies = dict(retries=3, transaction="immediate", log_sample_rate=1000)
+        plain = QueryExecutor(db_path, **policies)
+        caching = QueryExecutor(db_path, cache_size=256, **policies)
+        uncached, cached = _stacked_decorators(db_path)
+        logger.disabled = True
+
+        cases = (
+            ("read", plain, uncached, lambda i: (read, (i % 1000,))),
+            ("cached read", caching, cached, lambda i: (read, (i % 100,))),
+            ("write", plain, uncached, lambda i: (write, (f"u{i}", i % 1000))),
+        )
+        print(f"{'case':<12} {'stacked us':>11} {'executor us':>12} {'saved':>7}")
+        for name, executor, stacked, args_for in cases:
+            stacked_us = min(
+                _time_per_call(stacked, args_for, calls) for _ in range(rounds)
+            )
+            executor_us = min(
+                _time_per_call(executor, args_for, calls) for _ in range(rounds)
+            )
+            saved = 1 - executor_us / stacked_us
+            print(f"{name:<12} {stacked_us:>11.2f} {executor_us:>12.2f} {saved:>7.0%}")
+        plain.close()
+        caching.close()
+        logger.disabled = False
+
+
+if __name__ == "__main__":
+    #### compare the executor with the equivalent decorator stack
+    benchmark()
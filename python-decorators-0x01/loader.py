@@ -0,0 +1,42 @@
+"""Helpers for the tests: loads the numbered modules and builds a users.db"""
+import os
+import re
+import sqlite3
+import types
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+_TOP_LEVEL_DEF = re.compile(r"^(?:def|class|@)", re.MULTILINE)
+
+
+def load_module(filename):
+    """
+    Runs ``filename`` as a module, stopping at its "####" demo section.
+
+    The demos at the bottom of each file need a users.db in the working
+    directory and only print, so the tests leave them out.
+    """
+    path = os.path.join(HERE, filename)
+    with open(path, encoding="utf-8") as file:
+        source = file.read()
+    last_def = list(_TOP_LEVEL_DEF.finditer(source))[-1].start()
+    demo = source.find("\n####", last_def)
+    if demo != -1:
+        source = source[:demo]
+    module = types.ModuleType(os.path.splitext(filename)[0])
+    module.__file__ = path
+    exec(compile(source, path, "exec"), module.__dict__)
+    return module
+
+
+def make_users_db(directory, users=10):
+    """Creates users.db in ``directory`` with ``users`` users; returns its path"""
+    path = os.path.join(directory, "users.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+    conn.executemany(
+        "INSERT INTO users VALUES (?, ?)",
+        [(i, f"user{i}@example.com") for i in range(1, users + 1)],
+    )
+    conn.commit()
+    conn.close()
+    return path
@@ -0,0 +1,98 @@
+"""What the query decorators and the QueryExecutor agree on about a query"""
+import re
+import json
+import queue
+import atexit
+import logging
+import sqlite3
+import functools
+from logging.handlers import QueueHandler, QueueListener
+
+logger = logging.getLogger("queries")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+# sqlite3.OperationalError messages worth retrying; anything else fails fast
+TRANSIENT_MESSAGES = (
+    "database is locked",
+    "database table is locked",
+    "database is busy",
+    "disk i/o error",
+)
+
+READ_QUERY = re.compile(r"^\s*(SELECT|WITH|PRAGMA|EXPLAIN)\b", re.IGNORECASE)
+_TABLE_NAME = re.compile(
+    r"\b(?:FROM|JOIN|INTO|UPDATE|TABLE)\s+[`\"\[]?(\w+)", re.IGNORECASE
+)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+_listener = None
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queues records as they are, leaving all formatting to the listener"""
+
+    def prepare(self, record):
+        return record
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats a query record as one line of JSON"""
+
+    def format(self, record):
+        entry = {"ts": record.created}
+        entry.update(record.query)
+        return json.dumps(entry, default=str)
+
+
+def start_query_logging(*handlers):
+    """
+    Starts the background thread that writes query records.
+
+    Records go to ``handlers`` (stderr by default) from that thread, so the
+    thread running the query only pays for putting a record on a queue.
+    Called automatically the first time a query is logged; calling it once
+    the thread is running adds ``handlers`` to it.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.handlers += handlers
+        return
+    if not handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JSONFormatter())
+        handlers = (handler,)
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(_DeferredQueueHandler(log_queue))
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(query):
+    """
+    Normalises a query so that calls differing only in literals match.
+
+    >>> fingerprint("SELECT * FROM users WHERE id IN (1, 2,  3)")
+    'SELECT * FROM users WHERE id IN (?+)'
+    """
+    query = _STRING.sub("?", query)
+    query = _NUMBER.sub("?", query)
+    query = _IN_LIST.sub("(?+)", query)
+    return _SPACE.sub(" ", query).strip()
+
+
+def tables_in(query):
+    """Names of the tables a query reads from or writes to"""
+    return frozenset(name.lower() for name in _TABLE_NAME.findall(query))
+
+
+def is_transient(error):
+    """Tells whether an error is likely to go away if the call is retried"""
+    return isinstance(error, sqlite3.OperationalError) and any(
+        message in str(error).lower() for message in TRANSIENT_MESSAGES
+    )
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for the 4-cache_query.py file
+"""
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from loader import load_module, make_users_db
+
+cache_query = load_module("4-cache_query.py")
+
+
+class TestQueryCache(unittest.TestCase):
+    """Tests for QueryCache.get_or_load"""
+
+    def test_concurrent_misses_share_one_load(self):
+        """Only one of several concurrent callers runs a missing query"""
+        cache = cache_query.QueryCache()
+        loads = []
+        release = threading.Event()
+
+        def load():
+            loads.append(1)
+            release.wait()
+            return "rows"
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.get_or_load("key", load))
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(sorted(loaded for _, loaded in results), [False] * 7 + [True])
+        self.assertEqual({result for result, _ in results}, {"rows"})
+        self.assertEqual(cache.stats()["shared_loads"], 7)
+
+    def test_stale_entry_served_during_refresh(self):
+        """Callers get the stale result while one caller refreshes it"""
+        cache = cache_query.QueryCache(ttl=0.01, stale_ttl=10)
+        cache.set("key", "old")
+        time.sleep(0.02)
+        started = threading.Event()
+        release = threading.Event()
+
+        def refresh():
+            started.set()
+            release.wait()
+            return "new"
+
+        refresher = threading.Thread(target=cache.get_or_load, args=("key", refresh))
+        refresher.start()
+        started.wait()
+        self.assertEqual(cache.get_or_load("key", lambda: "other"), ("old", False))
+        release.set()
+        refresher.join()
+        self.assertEqual(cache.get("key"), (True, "new"))
+
+    def test_load_overlapping_a_write_is_not_stored(self):
+        """A result loaded while a write invalidated its table is not kept"""
+        cache = cache_query.QueryCache()
+        tables = frozenset({"users"})
+
+        def load():
+            cache.invalidate(tables)  # a write lands while the read runs
+            return "pre-write rows"
+
+        self.assertEqual(
+            cache.get_or_load("key", load, tables), ("pre-write rows", True)
+        )
+        self.assertEqual(cache.get("key"), (False, None))
+        self.assertEqual(
+            cache.get_or_load("key", lambda: "fresh", tables), ("fresh", True)
+        )
+        self.assertEqual(cache.get("key"), (True, "fresh"))
+
+
+class TestCacheQuery(unittest.TestCase):
+    """Tests for the cache_query decorator"""
+
+    def test_writes_invalidate_cached_reads(self):
+        """A write drops the cached reads of the table it changed"""
+        cache = cache_query.QueryCache()
+
+        @cache_query.cache_query(cache=cache)
+        def run(conn, query, params=()):
+            return conn.execute(query, params).fetchall()
+
+        with tempfile.TemporaryDirectory() as directory:
+            conn = sqlite3.connect(make_users_db(directory))
+            query = "SELECT email FROM users WHERE id = ?"
+            self.assertEqual(run(conn, query, (1,)), [("user1@example.com",)])
+            run(conn, "UPDATE users SET email = ? WHERE id = ?", ("new@x.com", 1))
+            self.assertEqual(run(conn, query, (1,)), [("new@x.com",)])
+            conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for the 0-log_queries.py file
+"""
+import logging
+import time
+import unittest
+
+from loader import load_module
+
+log_queries = load_module("0-log_queries.py")
+
+
+class ListHandler(logging.Handler):
+    """Keeps the query records it receives"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record.query)
+
+
+class TestLogQueries(unittest.TestCase):
+    """Tests for the log_queries decorator"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.handler = ListHandler()
+        log_queries.start_query_logging(cls.handler)
+
+    def setUp(self):
+        self.handler.records.clear()
+
+    def records(self, count):
+        deadline = time.monotonic() + 2
+        while len(self.handler.records) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.handler.records
+
+    def test_logs_fingerprint_and_rows(self):
+        """A call is logged with its fingerprint and number of rows"""
+
+        @log_queries.log_queries
+        def fetch(query):
+            return [(1,), (2,)]
+
+        fetch("SELECT * FROM users WHERE id IN (1, 2)")
+        (record,) = self.records(1)
+        self.assertEqual(record["fingerprint"], "SELECT * FROM users WHERE id IN (?+)")
+        self.assertEqual(record["rows"], 2)
+
+    def test_interrupted_call_is_logged_and_reraised(self):
+        """KeyboardInterrupt propagates as itself and is logged as an error"""
+
+        @log_queries.log_queries
+        def fetch(query):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            fetch("SELECT * FROM users")
+        (record,) = self.records(1)
+        self.assertEqual(record["error"], "KeyboardInterrupt()")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the 5-profile_queries.py file
+"""
+import sqlite3
+import tempfile
+import unittest
+
+from loader import load_module, make_users_db
+
+profile_queries = load_module("5-profile_queries.py")
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """Tests for LatencyHistogram"""
+
+    def test_quantiles_are_within_a_bucket(self):
+        """Quantiles land within one bucket width of the true value"""
+        histogram = profile_queries.LatencyHistogram()
+        for millis in range(1, 101):
+            histogram.record(millis / 1000)
+        growth = histogram.GROWTH
+        for q, expected in ((0.5, 0.050), (0.95, 0.095), (0.99, 0.099)):
+            estimate = histogram.quantile(q)
+            self.assertLessEqual(expected / growth, estimate)
+            self.assertLessEqual(estimate, expected * growth)
+        self.assertEqual(histogram.count, 100)
+
+
+class TestProfileQueries(unittest.TestCase):
+    """Tests for the profile_queries decorator"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = make_users_db(self.directory.name)
+        self.registry = profile_queries.QueryRegistry()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_records_calls_per_fingerprint(self):
+        """Calls differing only in literals are counted together"""
+
+        @profile_queries.with_db_connection
+        @profile_queries.profile_queries(target=self.registry)
+        def fetch(conn, query, params=()):
+            return conn.execute(query, params).fetchall()
+
+        fetch(self.db_path, "SELECT * FROM users WHERE id = 1")
+        fetch(self.db_path, "SELECT * FROM users WHERE id = 2")
+        (stats,) = self.registry.snapshot().values()
+        self.assertEqual((stats["calls"], stats["rows"]), (2, 2))
+        self.assertIsNotNone(stats["connection_wait_ms"])
+
+    def test_slow_query_plan_with_keyword_params(self):
+        """The plan is captured when the params are passed by keyword"""
+
+        @profile_queries.profile_queries(slow_ms=0, target=self.registry)
+        def fetch(conn, query, params=()):
+            return conn.execute(query, params).fetchall()
+
+        conn = sqlite3.connect(self.db_path)
+        fetch(conn, "SELECT * FROM users WHERE id = ?", params=(1,))
+        conn.close()
+        (stats,) = self.registry.snapshot().values()
+        self.assertTrue(stats["plan"])
+        self.assertIn("users", stats["plan"][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Tests for the 6-query_executor.py file
+"""
+import logging
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from loader import load_module, make_users_db
+
+query_executor = load_module("6-query_executor.py")
+log_queries = load_module("0-log_queries.py")
+retry_on_failure = load_module("3-retry_on_failure.py")
+cache_query = load_module("4-cache_query.py")
+profile_queries = load_module("5-profile_queries.py")
+
+
+class ListHandler(logging.Handler):
+    """Keeps the query records it receives"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record.query)
+
+
+class TestQueryExecutor(unittest.TestCase):
+    """Tests for QueryExecutor"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = make_users_db(self.directory.name)
+        self.executor = query_executor.QueryExecutor(
+            self.db_path, transaction="immediate", cache_size=16
+        )
+
+    def tearDown(self):
+        self.executor.close()
+        self.directory.cleanup()
+
+    def test_named_params_are_cached_separately(self):
+        """Reads with different named parameters get their own results"""
+        query = "SELECT email FROM users WHERE id = :id"
+        self.assertEqual(self.executor(query, {"id": 1}), [("user1@example.com",)])
+        self.assertEqual(self.executor(query, {"id": 2}), [("user2@example.com",)])
+        self.assertEqual(self.executor(query, {"id": 1}), [("user1@example.com",)])
+
+    def test_unhashable_params_run_uncached(self):
+        """Params that cannot be hashed skip the cache instead of failing"""
+        query = "SELECT email FROM users WHERE id = ?"
+        self.assertEqual(self.executor(query, [1]), [("user1@example.com",)])
+        self.assertEqual(len(self.executor._cache), 1)
+        with self.assertRaises(sqlite3.Error):  # sqlite rejects nested lists
+            self.executor(query, [[1]])
+
+    def test_write_invalidates_cached_reads(self):
+        """A write drops the cached reads of its table"""
+        query = "SELECT email FROM users WHERE id = ?"
+        self.executor(query, (1,))
+        self.executor("UPDATE users SET email = ? WHERE id = ?", ("new@x.com", 1))
+        self.assertEqual(self.executor(query, (1,)), [("new@x.com",)])
+
+    def test_read_overlapping_a_write_is_not_cached(self):
+        """A result read while a write invalidated its table is not kept"""
+        self.executor("SELECT 1")
+        conn = self.executor._local.conn
+
+        def write_lands():  # a write on another thread, mid-read
+            self.executor.invalidate(frozenset({"users"}))
+            return 1
+
+        conn.create_function("write_lands", 0, write_lands)
+        query = "SELECT email, write_lands() FROM users WHERE id = ?"
+        self.assertEqual(self.executor(query, (1,)), [("user1@example.com", 1)])
+        self.assertNotIn((query, (1,)), self.executor._cache)
+
+        query = "SELECT email FROM users WHERE id = ?"
+        self.executor(query, (1,))
+        self.assertIn((query, (1,)), self.executor._cache)
+
+    def test_retried_executemany_sees_every_row(self):
+        """A retry re-runs executemany with all the rows of an iterator"""
+        self.executor("INSERT INTO users VALUES (13, 'taken@x.com')")
+
+        def free_id_and_retry(error):
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("DELETE FROM users WHERE id = 13")
+            conn.commit()
+            conn.close()
+            return isinstance(error, sqlite3.IntegrityError)
+
+        executor = query_executor.QueryExecutor(
+            self.db_path,
+            transaction="immediate",
+            retries=1,
+            delay=0,
+            retry_on=free_id_and_retry,
+        )
+        rows = ((i, f"user{i}@x.com") for i in range(11, 14))
+        inserted = executor("INSERT INTO users VALUES (?, ?)", rows, many=True)
+        executor.close()
+        self.assertEqual(inserted, 3)
+        self.assertEqual(self.executor("SELECT COUNT(*) FROM users"), [(13,)])
+
+    def test_close_from_another_thread(self):
+        """close() closes connections opened on other threads"""
+        worker = threading.Thread(target=self.executor, args=("SELECT 1",))
+        worker.start()
+        worker.join()
+        self.executor.close()
+        self.assertEqual(self.executor._connections, [])
+
+    def test_cache_hits_are_sampled_and_logged(self):
+        """Hits count towards sampling and reach log_queries' handlers"""
+        handler = ListHandler()
+        log_queries.start_query_logging(handler)
+        executor = query_executor.QueryExecutor(
+            self.db_path, cache_size=16, log_sample_rate=2
+        )
+        for _ in range(4):
+            executor("SELECT email FROM users WHERE id = ?", (1,))
+        executor.close()
+        deadline = time.monotonic() + 2
+        while len(handler.records) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(handler.records), 2)
+        self.assertNotIn("cached", handler.records[0])
+        self.assertTrue(handler.records[1]["cached"])
+        self.assertEqual(handler.records[1]["rows"], 1)
+
+    def test_rules_match_the_decorators(self):
+        """The executor classifies queries and errors like the decorators do"""
+        for query in (
+            "SELECT * FROM users WHERE id IN (1, 2,  3)",
+            "SELECT * FROM users WHERE email = 'a@x.com' AND id > 4",
+            "  with recent AS (SELECT id FROM Users) SELECT * FROM recent",
+            "UPDATE users SET email = 'b@x.com' WHERE id = 2",
+            "INSERT INTO [logins] SELECT id FROM users",
+        ):
+            is_read, tables, fingerprint = query_executor.plan_query(query)
+            self.assertEqual(is_read, bool(cache_query.READ_QUERY.match(query)))
+            self.assertEqual(tables, cache_query.tables_in(query))
+            self.assertEqual(fingerprint, log_queries.fingerprint(query))
+            self.assertEqual(fingerprint, profile_queries.fingerprint(query))
+        for error in (
+            sqlite3.OperationalError("database is locked"),
+            sqlite3.OperationalError("no such table: users"),
+            sqlite3.IntegrityError("database is locked"),
+        ):
+            self.assertEqual(
+                query_executor.is_transient(error),
+                retry_on_failure.is_transient(error),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for the 3-retry_on_failure.py file
+"""
+import asyncio
+import io
+import sqlite3
+import time
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import AsyncMock, patch
+
+from loader import load_module
+
+retry_on_failure = load_module("3-retry_on_failure.py")
+
+LOCKED = sqlite3.OperationalError("database is locked")
+
+
+class Flaky:
+    """Raises the given errors in turn, then returns "ok\""""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class TestRetryOnFailure(unittest.TestCase):
+    """Tests for the retry_on_failure decorator and RetryBudget"""
+
+    def setUp(self):
+        self.budget = retry_on_failure.RetryBudget()
+        self.enterContext(redirect_stdout(io.StringIO()))  # "Attempt N failed"
+
+    def retrying(self, func, retries=3):
+        decorate = retry_on_failure.retry_on_failure(
+            retries=retries, delay=0, budget=self.budget
+        )
+        return decorate(func)
+
+    def test_transient_errors_are_retried(self):
+        """A call that fails twice with a locked database succeeds on the third"""
+        flaky = Flaky(LOCKED, LOCKED)
+        self.assertEqual(self.retrying(flaky)(), "ok")
+        self.assertEqual(flaky.calls, 3)
+        stats = self.budget.stats()
+        self.assertEqual((stats["retries"], stats["successes"]), (2, 1))
+
+    def test_non_transient_errors_fail_on_the_first_attempt(self):
+        """Errors that will not go away are raised without retrying"""
+        flaky = Flaky(sqlite3.OperationalError("no such table: users"))
+        with self.assertRaisesRegex(sqlite3.OperationalError, "no such table"):
+            self.retrying(flaky)()
+        self.assertEqual(flaky.calls, 1)
+        self.assertEqual(self.budget.stats()["retries"], 0)
+
+    def test_gives_up_after_retries(self):
+        """The last error is raised once the attempts run out"""
+        flaky = Flaky(*[LOCKED] * 5)
+        with self.assertRaises(sqlite3.OperationalError):
+            self.retrying(flaky, retries=3)()
+        self.assertEqual(flaky.calls, 3)
+        self.assertEqual(self.budget.stats()["give_ups"], 1)
+
+    def test_budget_exhausted(self):
+        """With no tokens left a call gives up instead of retrying"""
+        self.budget = retry_on_failure.RetryBudget(ratio=0, max_tokens=1)
+        with self.assertRaises(sqlite3.OperationalError):
+            self.retrying(Flaky(*[LOCKED] * 5))()
+        stats = self.budget.stats()
+        self.assertEqual(stats["retries"], 1)
+        self.assertEqual(stats["budget_exhausted"], 1)
+        self.assertEqual(stats["give_ups"], 1)
+        self.assertEqual(stats["attempts"], 2)
+
+    def test_circuit_opens_and_closes_after_cooldown(self):
+        """Calls fail fast after failure_threshold give-ups, until the cooldown"""
+        self.budget = retry_on_failure.RetryBudget(failure_threshold=2, cooldown=0.1)
+        for _ in range(2):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.retrying(Flaky(LOCKED), retries=1)()
+        flaky = Flaky()
+        with self.assertRaises(retry_on_failure.CircuitOpenError):
+            self.retrying(flaky)()
+        self.assertEqual(flaky.calls, 0)
+        self.assertEqual(self.budget.stats()["rejected"], 1)
+        time.sleep(0.15)
+        self.assertEqual(self.retrying(flaky)(), "ok")
+
+    def test_coroutines_await_instead_of_sleeping(self):
+        """The async wrapper backs off with asyncio.sleep, not time.sleep"""
+        flaky = Flaky(LOCKED, LOCKED)
+
+        async def fetch():
+            return flaky()
+
+        with patch.object(retry_on_failure.time, "sleep") as sleep, patch.object(
+            retry_on_failure.asyncio, "sleep", new=AsyncMock()
+        ) as async_sleep:
+            self.assertEqual(asyncio.run(self.retrying(fetch)()), "ok")
+        sleep.assert_not_called()
+        self.assertEqual(async_sleep.await_count, 2)
+        self.assertEqual(flaky.calls, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
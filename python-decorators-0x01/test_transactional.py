@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests for the 2-transactional.py file
+"""
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from loader import load_module, make_users_db
+
+transactional = load_module("2-transactional.py")
+
+
+def set_email(conn, user_id, email):
+    conn.execute("UPDATE users SET email = ? WHERE id = ?", (email, user_id))
+    return user_id
+
+
+def fail(conn):
+    conn.execute("UPDATE users SET email = 'lost' WHERE id = 2")
+    raise ValueError("boom")
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Gives each test its own users.db"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = make_users_db(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def email(self, user_id):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute("SELECT email FROM users WHERE id = ?", (user_id,))
+            return row.fetchone()[0]
+        finally:
+            conn.close()
+
+
+class TestTransactional(DatabaseTestCase):
+    """Tests for the transactional decorator"""
+
+    def test_commits_on_success(self):
+        """Changes are committed when the call returns"""
+        update = transactional.with_db_connection(
+            transactional.transactional(set_email)
+        )
+        update(self.db_path, 1, "new@example.com")
+        self.assertEqual(self.email(1), "new@example.com")
+
+    def test_rolls_back_on_error(self):
+        """Changes are rolled back when the call raises"""
+        failing = transactional.with_db_connection(transactional.transactional(fail))
+        with self.assertRaises(ValueError):
+            failing(self.db_path)
+        self.assertEqual(self.email(2), "user2@example.com")
+
+    def test_nested_call_rolls_back_only_its_savepoint(self):
+        """A failing nested call undoes its own changes, not the caller's"""
+        inner = transactional.transactional(fail)
+
+        @transactional.with_db_connection
+        @transactional.transactional(immediate=True)
+        def outer(conn):
+            set_email(conn, 1, "outer@example.com")
+            with self.assertRaises(ValueError):
+                inner(conn)
+
+        outer(self.db_path)
+        self.assertEqual(self.email(1), "outer@example.com")
+        self.assertEqual(self.email(2), "user2@example.com")
+
+
+class TestGroupCommitter(DatabaseTestCase):
+    """Tests for GroupCommitter and group_commit"""
+
+    def test_concurrent_calls_share_commits(self):
+        """Calls from many threads are committed together"""
+        committer = transactional.GroupCommitter(self.db_path, max_delay=0.05)
+        update = transactional.group_commit(committer)(set_email)
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda i=i: results.append(update(i, f"group{i}@x.com"))
+            )
+            for i in range(1, 11)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        committer.close()
+
+        self.assertEqual(sorted(results), list(range(1, 11)))
+        self.assertEqual(committer.calls, 10)
+        self.assertLess(committer.commits, 10)
+        self.assertEqual(self.email(7), "group7@x.com")
+
+    def test_failing_call_does_not_affect_its_group(self):
+        """Only the failing call of a group is rolled back"""
+        committer = transactional.GroupCommitter(self.db_path, max_delay=0.05)
+        failed = committer.submit(fail)
+        succeeded = committer.submit(set_email, 1, "kept@example.com")
+        self.assertEqual(succeeded.result(), 1)
+        self.assertIsInstance(failed.exception(), ValueError)
+        committer.close()
+        self.assertEqual(self.email(1), "kept@example.com")
+        self.assertEqual(self.email(2), "user2@example.com")
+
+    def test_submit_after_close_raises(self):
+        """Submitting to a closed committer fails instead of hanging"""
+        committer = transactional.GroupCommitter(self.db_path)
+        committer.close()
+        committer.close()
+        with self.assertRaises(RuntimeError):
+            committer.submit(set_email, 1, "late@example.com")
+
+
+class TestBulkUpdateUserEmails(DatabaseTestCase):
+    """Tests for bulk_update_user_emails"""
+
+    def test_counts_per_chunk(self):
+        """A generator of updates is sent in chunks and each chunk is counted"""
+        updates = ((i, f"new{i}@example.com") for i in range(1, 11))
+        counts = transactional.bulk_update_user_emails(
+            self.db_path, updates, chunk_size=4
+        )
+        self.assertEqual(counts, [4, 4, 2])
+        self.assertEqual(self.email(10), "new10@example.com")
+
+    def test_failing_chunk_rolls_back_earlier_chunks(self):
+        """An error in a later chunk undoes the chunks already sent"""
+
+        def updates():
+            for i in range(1, 6):
+                yield i, f"new{i}@example.com"
+            yield 6, ["not", "bindable"]
+
+        with self.assertRaises(sqlite3.Error):
+            transactional.bulk_update_user_emails(
+                self.db_path, updates(), chunk_size=4
+            )
+        self.assertEqual(self.email(1), "user1@example.com")
+        self.assertEqual(self.email(5), "user5@example.com")
+
+
+if __name__ == "__main__":
+    unittest.main()
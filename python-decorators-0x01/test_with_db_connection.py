@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for the 1-with_db_connection.py file
+"""
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from loader import load_module, make_users_db
+
+with_db_connection = load_module("1-with_db_connection.py")
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Tests for ConnectionPool and get_pool"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = make_users_db(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_thread_gets_back_its_connection(self):
+        """A thread reuses the connection it released last"""
+        pool = with_db_connection.ConnectionPool(self.db_path)
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        pool.release(conn)
+        pool.close()
+
+    def test_acquire_times_out_when_exhausted(self):
+        """acquire() gives up after ``timeout`` when every connection is out"""
+        pool = with_db_connection.ConnectionPool(self.db_path, max_size=1, timeout=0.05)
+        conn = pool.acquire()
+        with self.assertRaises(sqlite3.OperationalError):
+            pool.acquire()
+        pool.release(conn)
+        pool.close()
+
+    def test_release_rolls_back_uncommitted_work(self):
+        """Work left uncommitted is not visible to the next borrower"""
+        pool = with_db_connection.ConnectionPool(self.db_path, max_size=1)
+        conn = pool.acquire()
+        conn.execute("DELETE FROM users")
+        pool.release(conn)
+        conn = pool.acquire()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM users").fetchone(), (10,))
+        pool.release(conn)
+        pool.close()
+
+    def test_concurrent_callers_share_max_size_connections(self):
+        """Many threads never open more than ``max_size`` connections"""
+
+        @with_db_connection.with_db_connection(pooled=True, max_size=2)
+        def count(conn):
+            return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(count(self.db_path)))
+            for _ in range(16)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [10] * 16)
+        pool = with_db_connection.get_pool(self.db_path, max_size=2)
+        self.assertLessEqual(pool._size, 2)
+        pool.close()
+
+    def test_pools_are_keyed_on_options(self):
+        """Different options for the same database give different pools"""
+        small = with_db_connection.get_pool(self.db_path, max_size=1)
+        large = with_db_connection.get_pool(self.db_path, max_size=4)
+        self.assertIsNot(small, large)
+        self.assertEqual((small.max_size, large.max_size), (1, 4))
+        self.assertIs(with_db_connection.get_pool(self.db_path, max_size=1), small)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,29 +1,41 @@
 # ¡/usr/bin/python3
 import mysql.connector
 
+seed = __import__("seed")
+rows = __import__("rows")
 
-def stream_users():
-    """creates a generator that streams rows from an SQL database one by one"""
+
+def stream_users(prefetch=1000, row_mode="dict"):
+    """creates a generator that streams rows from an SQL database one by one
+
+    The cursor is unbuffered (mysql.connector's default, spelled out here),
+    so MySQL streams the result set as it is read and at most ``prefetch``
+    rows are held in memory at a time, whatever the size of the table.
+    Closing the generator early does not read the remaining rows; see
+    rows.close_cursor.
+
+    ``row_mode`` is "dict", "tuple" (named tuples) or "columnar" (one
+    rows.ColumnBatch per prefetch window), see rows.read_chunks.
+    """
     connection = None
     cursor = None
 
     try:
-        connection = mysql.connector.connect(
-            host="localhost", user="user", password="password", database="ALX_prodev"
-        )
+        connection = seed.connect_to_prodev()
+        if not connection:
+            return
 
-        cursor = connection.cursor(dictionary=True)
+        cursor = rows.open_cursor(connection, row_mode, buffered=False)
 
         cursor.execute("SELECT * FROM user_data")
 
-        for row in cursor:
-            yield row
+        yield from rows.read_chunks(cursor, prefetch, row_mode)
 
     except mysql.connector.Error as err:
         print(f"MySQL Error: {err}")
 
     finally:
         if cursor:
-            cursor.close()
+            rows.close_cursor(connection, cursor)
         if connection:
             connection.close()
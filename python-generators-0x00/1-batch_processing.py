@@ -1,11 +1,75 @@
 #!/usr/bin/python3
+import queue
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
 import mysql.connector
 
 seed = __import__("seed")
+rows = __import__("rows")
+
+_DONE = object()
+
+COLUMNS = ("user_id", "name", "email", "age", "updated_at")
+OPERATORS = ("=", "!=", "<", "<=", ">", ">=")
+
+# batch_processing prints whole rows, so it selects every column
+BATCH_PROCESSING_WHERE = [("age", ">", 25)]
+
+
+def build_where(where):
+    """
+    Compiles ``(column, operator, value)`` predicates into a WHERE clause.
+
+    Only known columns and operators are accepted; values are always passed
+    as query parameters. Returns a ``(clause, params)`` pair, where the
+    clause is empty if there is nothing to filter on.
+    """
+    conditions = []
+    params = []
+    for column, operator, value in where or []:
+        if column not in COLUMNS:
+            raise ValueError(f"Unknown column: {column}")
+        if operator not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {operator}")
+        conditions.append(f"{column} {operator} %s")
+        params.append(value)
+    if not conditions:
+        return "", ()
+    return " WHERE " + " AND ".join(conditions), tuple(params)
 
 
-def stream_users_in_batches(batch_size):
-    """Fetches rows in batches"""
+def build_select(columns=None, where=None, order_by=None):
+    """
+    Compiles a projection and simple predicates into a parameterised query.
+
+    ``columns`` is a list of user_data columns to fetch (all by default) and
+    ``where`` a list of ``(column, operator, value)`` tuples that are ANDed
+    together, e.g. ``[("age", ">", 25)]`` (see build_where).
+    Returns a ``(query, params)`` pair.
+    """
+    for column in list(columns or []) + ([order_by] if order_by else []):
+        if column not in COLUMNS:
+            raise ValueError(f"Unknown column: {column}")
+
+    clause, params = build_where(where)
+    query = "SELECT {} FROM user_data".format(", ".join(columns) if columns else "*")
+    query += clause
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    return query, params
+
+
+def stream_users_in_batches(batch_size, columns=None, where=None, row_mode="dict"):
+    """Fetches rows in batches
+
+    ``columns`` and ``where`` are pushed down into the query (see
+    build_select), so only the matching rows and requested columns are sent
+    over the network. ``row_mode`` selects how rows are represented, see
+    rows.read_chunks.
+    """
+    query, params = build_select(columns, where)
     connection = None
     cursor = None
     try:
@@ -14,28 +78,195 @@ def stream_users_in_batches(batch_size):
         if not connection:
             return
 
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM user_data")
+        cursor = rows.open_cursor(connection, row_mode)
+        cursor.execute(query, params)
 
-        while True:
-            batch = cursor.fetchmany(batch_size)
-            if not batch:
-                break
-            for row in batch:
-                yield row
+        yield from rows.read_chunks(cursor, batch_size, row_mode)
 
     except mysql.connector.Error as err:
         print(f"MySQL Error: {err}")
 
     finally:
         if cursor:
-            cursor.close()
+            rows.close_cursor(connection, cursor)
         if connection:
             connection.close()
 
 
 def batch_processing(batch_size):
     """Processes data in batches"""
-    for user in stream_users_in_batches(batch_size):
-        if int(user["age"]) > 25:
-            print(user)
+    for user in stream_users_in_batches(batch_size, where=BATCH_PROCESSING_WHERE):
+        print(user)
+
+
+def key_ranges(partitions):
+    """
+    Splits the user_id key space into ``partitions`` contiguous ranges.
+
+    user_ids are UUIDs, so they are spread evenly over the key space and
+    equal-width ranges hold roughly the same number of rows. The first
+    range has no lower bound and the last has no upper bound.
+    """
+    step = (1 << 128) // partitions
+    bounds = [uuid.UUID(int=step * i).bytes for i in range(1, partitions)]
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+class _Failed:
+    """Put on a range's queue when its scan raised, so the consumer can too"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _connect():
+    connection = seed.connect_to_prodev()
+    if not connection:
+        raise mysql.connector.Error("Could not connect to ALX_prodev")
+    return connection
+
+
+def _scan_range(query, params, batch_size, put, stop):
+    """Streams one key range over its own connection into ``put``"""
+    connection = _connect()
+    cursor = None
+    try:
+        cursor = connection.cursor(dictionary=True, buffered=False)
+        cursor.execute(query, params)
+
+        while not stop.is_set():
+            batch = cursor.fetchmany(batch_size)
+            if not batch or not put(batch):
+                break
+
+    finally:
+        if cursor:
+            rows.close_cursor(connection, cursor)
+        connection.close()
+
+
+def page_query(columns, bounds, after, page_size):
+    """The keyset query for the page of a key range that follows ``after``"""
+    seek = [] if after is None else [("user_id", ">", after)]
+    query, params = build_select(columns, list(bounds) + seek, "user_id")
+    return query + " LIMIT %s", params + (page_size,)
+
+
+def _page_range(columns, bounds, batch_size, put, room, stop):
+    """
+    Reads one key range page by page, in user_id order, into ``put``.
+
+    Each page is a separate keyset query that is only sent once ``room()``
+    says the consumer has space for it, so no result set is held open on
+    the server while the worker waits its turn.
+    """
+    connection = _connect()
+    cursor = connection.cursor(dictionary=True)
+    after = None
+    try:
+        while room():
+            cursor.execute(*page_query(columns, bounds, after, batch_size))
+            page = cursor.fetchall()
+            if not page or not put(page) or len(page) < batch_size:
+                break
+            after = page[-1]["user_id"]
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def stream_users_partitioned(
+    batch_size, workers=4, ordered=False, max_pending=2, columns=None, where=None
+):
+    """
+    Streams user_data rows by scanning ``workers`` key ranges in parallel.
+
+    Every range is read over its own connection on a worker thread and the
+    batches are merged into one generator. Each worker may run at most
+    ``max_pending`` batches ahead of the consumer. With ``ordered=True``
+    rows come out in user_id order, otherwise in whatever order the workers
+    produce them. ``columns`` and ``where`` are pushed down as in
+    stream_users_in_batches.
+
+    In ordered mode each range is read in keyset pages (see _page_range),
+    because a range can wait a long time for the ones before it and an
+    open streaming result set would hit the server's net_write_timeout.
+    An error in any range is raised from the generator rather than leaving
+    the caller with a silently incomplete table.
+    """
+    if ordered and columns and "user_id" not in columns:
+        columns = ["user_id"] + list(columns)
+    ranges = key_ranges(workers)
+    stop = threading.Event()
+    if ordered:
+        queues = [queue.Queue(max_pending) for _ in ranges]
+    else:
+        queues = [queue.Queue(max_pending * workers)] * len(ranges)
+
+    def make_put(q):
+        def put(item):
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        return put
+
+    def make_room(q):
+        def room():
+            while q.full() and not stop.is_set():
+                stop.wait(0.01)
+            return not stop.is_set()
+
+        return room
+
+    scans = []
+    for low, high in ranges:
+        bounds = list(where or [])
+        if low is not None:
+            bounds.append(("user_id", ">=", low))
+        if high is not None:
+            bounds.append(("user_id", "<", high))
+        # Built here so that bad columns or predicates raise straight away
+        order_by = "user_id" if ordered else None
+        scans.append((bounds, build_select(columns, bounds, order_by)))
+
+    def run(index, bounds, query, params):
+        put = make_put(queues[index])
+        try:
+            if ordered:
+                room = make_room(queues[index])
+                _page_range(columns, bounds, batch_size, put, room, stop)
+            else:
+                _scan_range(query, params, batch_size, put, stop)
+        except Exception as e:
+            put(_Failed(e))
+        finally:
+            put(_DONE)
+
+    def check(batch):
+        if isinstance(batch, _Failed):
+            raise batch.error
+        return batch
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for index, (bounds, (query, params)) in enumerate(scans):
+            executor.submit(run, index, bounds, query, params)
+        try:
+            if ordered:
+                for q in queues:
+                    for batch in iter(q.get, _DONE):
+                        yield from check(batch)
+            else:
+                remaining = len(ranges)
+                while remaining:
+                    batch = queues[0].get()
+                    if batch is _DONE:
+                        remaining -= 1
+                        continue
+                    yield from check(batch)
+        finally:
+            stop.set()
@@ -1,4 +1,6 @@
 #!/usr/bin/python3
+import base64
+
 seed = __import__("seed")
 
 
@@ -25,3 +27,63 @@ def lazy_paginate(page_size):
             break
         yield page
         offset += page_size
+
+
+def encode_resume_token(user_id):
+    """Turns the last seen user_id into an opaque resume token"""
+    if isinstance(user_id, str):
+        user_id = user_id.encode("utf-8")
+    return base64.urlsafe_b64encode(bytes(user_id)).decode("ascii")
+
+
+def decode_resume_token(token):
+    """Recovers the (binary) user_id a resume token was made from"""
+    return base64.urlsafe_b64decode(token.encode("ascii"))
+
+
+FIRST_PAGE_QUERY = "SELECT * FROM user_data ORDER BY user_id LIMIT %s"
+SEEK_QUERY = "SELECT * FROM user_data WHERE user_id > %s ORDER BY user_id LIMIT %s"
+
+
+def seek_users(connection, page_size, after=None):
+    """
+    Fetches the page of rows that follows the user_id ``after``.
+
+    Uses the primary key index to seek straight to the start of the page,
+    so every page costs the same no matter how deep into the table it is.
+    """
+    cursor = connection.cursor(dictionary=True)
+    try:
+        if after is None:
+            cursor.execute(FIRST_PAGE_QUERY, (page_size,))
+        else:
+            cursor.execute(SEEK_QUERY, (after, page_size))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def lazy_paginate_keyset(page_size, resume_token=None):
+    """
+    Generator that paginates through user_data by seeking on user_id.
+
+    Yields ``(page, token)`` pairs over a single connection. Passing the
+    token of the last page that was handled back in as ``resume_token``
+    continues the scan right after that page.
+    """
+    after = decode_resume_token(resume_token) if resume_token else None
+    connection = seed.connect_to_prodev()
+    if not connection:
+        return
+
+    try:
+        while True:
+            page = seek_users(connection, page_size, after)
+            if not page:
+                break
+            after = page[-1]["user_id"]
+            yield page, encode_resume_token(after)
+            if len(page) < page_size:
+                break
+    finally:
+        connection.close()
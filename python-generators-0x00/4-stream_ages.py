@@ -2,6 +2,12 @@
 import mysql.connector
 
 seed = __import__("seed")
+rows = __import__("rows")
+aggregates = __import__("aggregates")
+
+
+AGES_QUERY = "SELECT age FROM user_data"
+AVERAGE_AGE = ("AVG", "COUNT")
 
 
 def stream_user_ages():
@@ -15,38 +21,44 @@ def stream_user_ages():
 
     try:
         connection = seed.connect_to_prodev()
-        cursor = connection.cursor(dictionary=True)
+        cursor = connection.cursor()
 
-        cursor.execute("SELECT age FROM user_data")
+        cursor.execute(AGES_QUERY)
 
-        for row in cursor:
-            yield row["age"]
+        for (age,) in cursor:
+            yield age
 
     except mysql.connector.Error as err:
         print(f"MySQL Error: {err}")
 
     finally:
         if cursor:
-            cursor.close()
+            rows.close_cursor(connection, cursor)
 
         if connection:
             connection.close()
 
 
 def calculate_average_age():
-    """Calculates average age"""
+    """Calculates average age
 
-    total_age = 0
-    count = 0
+    MySQL computes the average (see aggregates.sql_aggregate), so only one
+    row crosses the network however large the table is.
+    """
 
-    for age in stream_user_ages():
-        if age is not None:
-            total_age += int(age)
-            count += 1
+    connection = seed.connect_to_prodev()
+    if not connection:
+        return
+    try:
+        result = aggregates.sql_aggregate(connection, "age", AVERAGE_AGE)
+    except mysql.connector.Error as err:
+        print(f"MySQL Error: {err}")
+        return
+    finally:
+        connection.close()
 
-    if count == 0:
+    if not result["count"]:
         print("No users found.")
+        return
 
-    avg_age = total_age / count
-
-    print(f"Average age of users: {avg_age:.2f}")
+    print(f"Average age of users: {result['avg']:.2f}")
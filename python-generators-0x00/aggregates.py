@@ -0,0 +1,287 @@
+#!/usr/bin/python3
+"""Aggregates over user_data, computed in SQL where possible"""
+import json
+import math
+import os
+import random
+
+import mysql.connector
+
+seed = __import__("seed")
+batches = __import__("1-batch_processing")
+pages = __import__("2-lazy_paginate")
+
+SQL_FUNCTIONS = ("AVG", "COUNT", "SUM", "MIN", "MAX")
+
+
+def aggregate_query(column="age", functions=SQL_FUNCTIONS, where=None):
+    """Returns the ``(query, params)`` sql_aggregate runs"""
+    if column not in batches.COLUMNS:
+        raise ValueError(f"Unknown column: {column}")
+    for function in functions:
+        if function not in SQL_FUNCTIONS:
+            raise ValueError(f"Unsupported aggregate: {function}")
+
+    clause, params = batches.build_where(where)
+    select = ", ".join(f"{function}({column})" for function in functions)
+    return f"SELECT {select} FROM user_data{clause}", params
+
+
+def sql_aggregate(connection, column="age", functions=SQL_FUNCTIONS, where=None):
+    """
+    Lets MySQL compute aggregates of ``column`` in a single query.
+
+    ``functions`` is any of SQL_FUNCTIONS and ``where`` takes the same
+    predicates as stream_users_in_batches. Returns a dict keyed by the
+    lower-cased function names, e.g. ``{"avg": 42.1, "count": 1000, ...}``.
+    Averages of an empty selection come back as None.
+    """
+    query, params = aggregate_query(column, functions, where)
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return {
+        function.lower(): float(value) if function == "AVG" and value is not None
+        else value
+        for function, value in zip(functions, row)
+    }
+
+
+class OnlineStats:
+    """
+    One-pass count, sum, mean, variance, min and max of a stream of numbers.
+
+    Uses Welford's update, so the variance stays accurate even for long
+    streams of large, similar values. Two instances can be merged, which is
+    how partial results (e.g. from an incremental refresh) are combined.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """Adds one value to the running statistics"""
+        value = float(value)
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """Folds the statistics of another OnlineStats into this one"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Population variance, or None when nothing was added"""
+        return self.m2 / self.count if self.count else None
+
+    @property
+    def stddev(self):
+        """Population standard deviation, or None when nothing was added"""
+        return math.sqrt(self.variance) if self.count else None
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls()
+        stats.__dict__.update(state)
+        return stats
+
+
+class QuantileSketch:
+    """
+    Approximate quantiles of a stream in bounded memory.
+
+    Keeps a uniform random sample (reservoir) of at most ``size`` values, so
+    quantiles are estimated from the sample whatever the length of the
+    stream.
+    """
+
+    def __init__(self, size=1024, seed=None):
+        self.size = size
+        self.seen = 0
+        self.sample = []
+        self._random = random.Random(seed)
+
+    def add(self, value):
+        """Offers one value to the reservoir"""
+        self.seen += 1
+        if len(self.sample) < self.size:
+            self.sample.append(value)
+            return
+        index = self._random.randrange(self.seen)
+        if index < self.size:
+            self.sample[index] = value
+
+    def quantile(self, q):
+        """Estimated q-quantile (0 <= q <= 1), or None when empty"""
+        if not self.sample:
+            return None
+        ordered = sorted(self.sample)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def stream_aggregate(values, quantiles=(0.5, 0.95, 0.99), sketch_size=1024):
+    """
+    Aggregates a stream of values in one pass.
+
+    This is the fallback for when the values have to come through Python
+    anyway, e.g. from stream_user_ages(). None values are skipped.
+    Returns ``(stats, {q: estimate})``.
+    """
+    stats = OnlineStats()
+    sketch = QuantileSketch(sketch_size)
+    for value in values:
+        if value is None:
+            continue
+        stats.add(value)
+        sketch.add(float(value))
+    return stats, {q: sketch.quantile(q) for q in quantiles}
+
+
+def _load_state(state_path):
+    if not os.path.exists(state_path):
+        return None, OnlineStats()
+    with open(state_path, encoding="utf-8") as file:
+        state = json.load(file)
+    return state["watermark"], OnlineStats.from_dict(state["stats"])
+
+
+def _save_state(state_path, watermark, stats):
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump({"watermark": watermark, "stats": stats.to_dict()}, file)
+    os.replace(tmp_path, state_path)
+
+
+# The (updated_at, user_id) cursor refresh_aggregate shares with changes.py
+AFTER_WATERMARK = "(updated_at > %s OR (updated_at = %s AND user_id > %s))"
+UP_TO_WATERMARK = "(updated_at < %s OR (updated_at = %s AND user_id <= %s))"
+LAST_CHANGE_QUERY = (
+    "SELECT updated_at, user_id FROM user_data WHERE {after}"
+    "updated_at <= NOW(6) - INTERVAL %s MICROSECOND "
+    "ORDER BY updated_at DESC, user_id DESC LIMIT 1"
+)
+ROW_COUNT_QUERY = f"SELECT COUNT(*) FROM user_data WHERE {UP_TO_WATERMARK}"
+
+
+def stats_query(column, where):
+    """The query refresh_aggregate uses to aggregate the rows in ``where``"""
+    return (
+        f"SELECT COUNT({column}), SUM({column}), AVG({column}), "
+        f"VAR_POP({column}), MIN({column}), MAX({column}) "
+        f"FROM user_data WHERE {where}"
+    )
+
+
+def _stats_from_row(row):
+    count, total, mean, variance, low, high = row
+    if not count:
+        return OnlineStats()
+    return OnlineStats.from_dict(
+        {
+            "count": count,
+            "total": float(total),
+            "mean": float(mean),
+            "m2": float(variance) * count,
+            "min": float(low),
+            "max": float(high),
+        }
+    )
+
+
+def refresh_aggregate(state_path, column="age", lag_seconds=1.0):
+    """
+    Incrementally refreshes stored statistics of ``column``.
+
+    Rows are picked up in (updated_at, user_id) order after the watermark
+    stored in ``state_path``, the same cursor stream_changes uses. Rows
+    touched in the last ``lag_seconds`` are left for the next run, so a
+    transaction that commits after its timestamp is not missed. The new
+    rows are aggregated in SQL and merged into the stored statistics, then
+    the new watermark is saved. Returns the up-to-date OnlineStats.
+
+    An updated row moves past the watermark and would be merged a second
+    time, and a deleted one would never be taken out. Both show up as a
+    merged count that differs from the number of rows up to the new
+    watermark (user_data columns are NOT NULL), in which case the
+    statistics are recomputed from scratch instead.
+    """
+    if column not in batches.COLUMNS:
+        raise ValueError(f"Unknown column: {column}")
+
+    watermark, stats = _load_state(state_path)
+    after = ""
+    params = ()
+    if watermark is not None:
+        after = AFTER_WATERMARK + " AND "
+        updated_at = watermark["updated_at"]
+        user_id = pages.decode_resume_token(watermark["token"])
+        params = (updated_at, updated_at, user_id)
+
+    connection = seed.connect_to_prodev()
+    if not connection:
+        return stats
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            LAST_CHANGE_QUERY.format(after=after),
+            params + (int(lag_seconds * 1000000),),
+        )
+        last = cursor.fetchone()
+        if last is None:
+            return stats
+        up_to = (last[0], last[0], last[1])
+        cursor.execute(stats_query(column, after + UP_TO_WATERMARK), params + up_to)
+        merged = OnlineStats.from_dict(stats.to_dict()).merge(
+            _stats_from_row(cursor.fetchone())
+        )
+        cursor.execute(ROW_COUNT_QUERY, up_to)
+        (rows,) = cursor.fetchone()
+        if merged.count != rows:
+            print(
+                "user_data rows were updated or deleted since the last refresh; "
+                f"recomputing {column} statistics"
+            )
+            cursor.execute(stats_query(column, UP_TO_WATERMARK), up_to)
+            merged = _stats_from_row(cursor.fetchone())
+    except mysql.connector.Error as err:
+        print(f"MySQL Error: {err}")
+        return stats
+    finally:
+        cursor.close()
+        connection.close()
+
+    watermark = {
+        "updated_at": last[0].isoformat(sep=" "),
+        "token": pages.encode_resume_token(last[1]),
+    }
+    _save_state(state_path, watermark, merged)
+    return merged
@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+"""Async generator counterparts of the blocking user_data streams"""
+import asyncio
+import threading
+from itertools import islice
+
+streams = __import__("0-stream_users")
+batches = __import__("1-batch_processing")
+pages = __import__("2-lazy_paginate")
+ages = __import__("4-stream_ages")
+
+
+async def aiterate(generator, chunk_size=100, executor=None):
+    """
+    Drives a blocking generator from an executor thread.
+
+    Items are pulled ``chunk_size`` at a time, so the event loop never waits
+    on the database. At most one chunk is read ahead of the consumer, which
+    is the backpressure: a slow consumer stops the underlying query from
+    being read further. Close the async generator (e.g. with
+    contextlib.aclosing) when stopping early so the cursor and connection
+    are released.
+    """
+    loop = asyncio.get_running_loop()
+    lock = threading.Lock()
+
+    def pull():
+        with lock:
+            return list(islice(generator, chunk_size))
+
+    def close():
+        with lock:
+            generator.close()
+
+    pending = loop.run_in_executor(executor, pull)
+    try:
+        while True:
+            chunk = await pending
+            if not chunk:
+                break
+            pending = loop.run_in_executor(executor, pull)
+            for item in chunk:
+                yield item
+    finally:
+        pending.cancel()
+        await loop.run_in_executor(executor, close)
+
+
+def async_stream_users(prefetch=1000, row_mode="dict", executor=None):
+    """Async version of stream_users"""
+    return aiterate(streams.stream_users(prefetch, row_mode), prefetch, executor)
+
+
+def async_stream_users_in_batches(
+    batch_size, columns=None, where=None, row_mode="dict", executor=None
+):
+    """Async version of stream_users_in_batches"""
+    generator = batches.stream_users_in_batches(batch_size, columns, where, row_mode)
+    return aiterate(generator, batch_size, executor)
+
+
+def async_lazy_paginate(page_size, executor=None):
+    """Async version of lazy_paginate, yields one page at a time"""
+    return aiterate(pages.lazy_paginate(page_size), 1, executor)
+
+
+def async_stream_user_ages(chunk_size=1000, executor=None):
+    """Async version of stream_user_ages"""
+    return aiterate(ages.stream_user_ages(), chunk_size, executor)
@@ -0,0 +1,215 @@
+#!/usr/bin/python3
+"""
+Benchmarks the user_data streaming strategies.
+
+Seeds a dedicated database (ALX_prodev_benchmark by default, never the
+application's ALX_prodev unless asked to) with synthetic users at each
+requested size, then runs every strategy at every batch size in a fresh
+process and records throughput, time to first row and peak RSS in a JSON
+report, e.g.
+
+    ./benchmark.py --sizes 10000 100000 --batch-sizes 100 1000 -o report.json
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import tempfile
+import time
+from datetime import datetime, timezone
+
+seed = __import__("seed")
+
+BENCHMARK_DATABASE = "ALX_prodev_benchmark"
+
+
+def _count_rows(item):
+    """Rows in one item yielded by a strategy (a row, a page or a batch)"""
+    if isinstance(item, tuple) and len(item) == 2 and isinstance(item[0], list):
+        return len(item[0])
+    if isinstance(item, list) or type(item).__name__ == "ColumnBatch":
+        return len(item)
+    return 1
+
+
+def _strategy(name, batch_size):
+    """Builds the generator for one strategy; runs in the worker process"""
+    streams = __import__("0-stream_users")
+    batches = __import__("1-batch_processing")
+    pages = __import__("2-lazy_paginate")
+    ages = __import__("4-stream_ages")
+    strategies = {
+        "stream_users": lambda: streams.stream_users(batch_size),
+        "stream_users_tuple": lambda: streams.stream_users(batch_size, "tuple"),
+        "stream_users_columnar": lambda: streams.stream_users(batch_size, "columnar"),
+        "stream_users_in_batches": lambda: batches.stream_users_in_batches(
+            batch_size
+        ),
+        "stream_users_partitioned": lambda: batches.stream_users_partitioned(
+            batch_size
+        ),
+        "lazy_paginate": lambda: pages.lazy_paginate(batch_size),
+        "lazy_paginate_keyset": lambda: pages.lazy_paginate_keyset(batch_size),
+        "stream_user_ages": ages.stream_user_ages,
+    }
+    return strategies[name]()
+
+
+STRATEGIES = (
+    "stream_users",
+    "stream_users_tuple",
+    "stream_users_columnar",
+    "stream_users_in_batches",
+    "stream_users_partitioned",
+    "lazy_paginate",
+    "lazy_paginate_keyset",
+    "stream_user_ages",
+)
+
+
+def use_database(database):
+    """Creates ``database`` if needed and points seed's connections at it"""
+    server = seed.connect_db()
+    if not server:
+        raise SystemExit("Could not connect to the MySQL server")
+    cursor = server.cursor()
+    try:
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database}`")
+    finally:
+        cursor.close()
+        server.close()
+    seed.PRODEV_CONFIG["database"] = database
+
+
+def _measure(database, name, batch_size, results):
+    """Runs one strategy to completion and reports its timings"""
+    seed.PRODEV_CONFIG["database"] = database
+    started = time.perf_counter()
+    first_row = None
+    rows = 0
+    for item in _strategy(name, batch_size):
+        if first_row is None:
+            first_row = time.perf_counter() - started
+        rows += _count_rows(item)
+    elapsed = time.perf_counter() - started
+    results.put(
+        {
+            "rows": rows,
+            "seconds": elapsed,
+            "rows_per_sec": rows / elapsed if elapsed > 0 else 0.0,
+            "time_to_first_row_ms": (first_row or 0.0) * 1000,
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+    )
+
+
+def run_strategy(name, batch_size):
+    """Measures a strategy in a fresh process so peak RSS is its own"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=_measure,
+        args=(seed.PRODEV_CONFIG["database"], name, batch_size, results),
+    )
+    process.start()
+    process.join()
+    if process.exitcode != 0 or results.empty():
+        raise RuntimeError(f"{name} (batch {batch_size}) failed")
+    return results.get()
+
+
+def seed_users(size, batch_size=10000, rng_seed=0):
+    """
+    Replaces the contents of user_data with ``size`` synthetic users.
+
+    Truncates user_data in whatever database seed connects to, so call
+    use_database first.
+    """
+    rng = random.Random(rng_seed)
+    connection = seed.connect_to_prodev()
+    if not connection:
+        raise SystemExit(f"Could not connect to {seed.PRODEV_CONFIG['database']}")
+    try:
+        seed.create_table(connection)
+        cursor = connection.cursor()
+        cursor.execute("TRUNCATE TABLE user_data")
+        cursor.close()
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".csv", newline="", delete=False
+        ) as file:
+            writer = csv.writer(file)
+            writer.writerow(seed.USER_COLUMNS)
+            for i in range(size):
+                age = rng.randint(18, 90)
+                writer.writerow((f"User {i}", f"user{i}@example.com", age))
+        try:
+            seed.insert_table_bulk(connection, file.name, batch_size)
+        finally:
+            os.unlink(file.name)
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[100, 1000, 10000]
+    )
+    parser.add_argument(
+        "--strategies", nargs="+", choices=STRATEGIES, default=list(STRATEGIES)
+    )
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("-o", "--output", default="benchmark_report.json")
+    parser.add_argument(
+        "--database",
+        default=BENCHMARK_DATABASE,
+        help="database to seed; its user_data table is truncated",
+    )
+    parser.add_argument(
+        "--i-know-this-truncates",
+        action="store_true",
+        help="allow --database ALX_prodev, wiping the application's users",
+    )
+    args = parser.parse_args()
+    if args.database == "ALX_prodev" and not args.i_know_this_truncates:
+        parser.error(
+            "seeding ALX_prodev truncates user_data; "
+            "pass --i-know-this-truncates to do it anyway"
+        )
+    use_database(args.database)
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": args.database,
+        "results": [],
+    }
+    for size in args.sizes:
+        print(f"Seeding {size} users...")
+        seed_users(size)
+        for name in args.strategies:
+            for batch_size in args.batch_sizes:
+                runs = [run_strategy(name, batch_size) for _ in range(args.repeat)]
+                best = max(runs, key=lambda run: run["rows_per_sec"])
+                best.update(size=size, strategy=name, batch_size=batch_size)
+                report["results"].append(best)
+                print(
+                    f"{name:<26} size={size:<9} batch={batch_size:<6} "
+                    f"{best['rows_per_sec']:>12.0f} rows/s "
+                    f"ttfr={best['time_to_first_row_ms']:.1f}ms "
+                    f"rss={best['peak_rss_kb']}KB"
+                )
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
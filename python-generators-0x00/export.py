@@ -0,0 +1,176 @@
+#!/usr/bin/python3
+"""Resumable, checkpointed export of user_data"""
+import csv
+import json
+import os
+import time
+import uuid
+from decimal import Decimal
+
+import mysql.connector
+
+seed = __import__("seed")
+pages = __import__("2-lazy_paginate")
+
+FORMATS = ("csv", "jsonl", "chunked")
+
+
+def _plain(value):
+    """Converts MySQL values into something CSV and JSON can hold"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (bytes, bytearray)):
+        if len(value) == 16:
+            return str(uuid.UUID(bytes=bytes(value)))
+        return value.hex()
+    return value
+
+
+def _write_atomically(path, write):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class _FileWriter:
+    """Appends pages to a single CSV or JSON Lines file"""
+
+    def __init__(self, path, fmt, offset):
+        self.path = path
+        self.fmt = fmt
+        if os.path.exists(path):
+            os.truncate(path, offset)
+        self.file = open(path, "a", encoding="utf-8", newline="")
+        self.csv = csv.writer(self.file) if fmt == "csv" else None
+        self.header_written = offset > 0
+
+    def write(self, page, batch):
+        if self.csv:
+            if not self.header_written:
+                self.csv.writerow(page[0].keys())
+                self.header_written = True
+            self.csv.writerows([_plain(v) for v in row.values()] for row in page)
+        else:
+            for row in page:
+                record = {key: _plain(value) for key, value in row.items()}
+                self.file.write(json.dumps(record) + "\n")
+
+    def sync(self):
+        """Flushes to disk and returns the offset to resume from"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return os.fstat(self.file.fileno()).st_size
+
+    def close(self):
+        self.file.close()
+
+
+class _ChunkWriter:
+    """Writes every page to its own numbered JSON Lines file in a directory"""
+
+    def __init__(self, path, fmt, offset):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, page, batch):
+        def write(file):
+            for row in page:
+                record = {key: _plain(value) for key, value in row.items()}
+                file.write(json.dumps(record) + "\n")
+
+        _write_atomically(os.path.join(self.path, f"part-{batch:06d}.jsonl"), write)
+
+    def sync(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+def load_checkpoint(checkpoint_path):
+    """Returns the saved export state, or None when there is none"""
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_checkpoint(checkpoint_path, state):
+    """Saves the export state atomically"""
+    _write_atomically(checkpoint_path, lambda file: json.dump(state, file))
+
+
+def export_users(
+    output,
+    fmt="csv",
+    batch_size=1000,
+    checkpoint_path=None,
+    checkpoint_every=10,
+    max_retries=5,
+    retry_delay=1.0,
+):
+    """
+    Exports user_data to ``output`` and survives failures along the way.
+
+    Rows are read in user_id order, ``batch_size`` at a time, so only one
+    batch is held in memory. Every ``checkpoint_every`` batches the output
+    is flushed to disk and the last exported key, the batch number and the
+    output offset are saved to ``checkpoint_path``. On a MySQL error the
+    export reconnects and carries on (up to ``max_retries`` times in a row,
+    backing off exponentially). If the process dies, calling export_users
+    again with the same arguments resumes from the last checkpoint.
+
+    ``fmt`` is "csv", "jsonl" or "chunked" (a directory holding one
+    part-NNNNNN.jsonl file per batch). Returns the number of rows exported.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    checkpoint_path = checkpoint_path or output.rstrip(os.sep) + ".checkpoint"
+    state = load_checkpoint(checkpoint_path)
+    if state is None or state.get("format") != fmt:
+        state = {"format": fmt, "token": None, "batch": 0, "rows": 0, "offset": 0}
+
+    writer_class = _ChunkWriter if fmt == "chunked" else _FileWriter
+    writer = writer_class(output, fmt, state["offset"])
+    after = pages.decode_resume_token(state["token"]) if state["token"] else None
+    failures = 0
+    try:
+        while True:
+            connection = seed.connect_to_prodev()
+            try:
+                if not connection:
+                    raise mysql.connector.Error("Could not connect to ALX_prodev")
+                while True:
+                    page = pages.seek_users(connection, batch_size, after)
+                    if not page:
+                        break
+                    state["batch"] += 1
+                    writer.write(page, state["batch"])
+                    after = page[-1]["user_id"]
+                    state["rows"] += len(page)
+                    state["token"] = pages.encode_resume_token(after)
+                    if state["batch"] % checkpoint_every == 0:
+                        state["offset"] = writer.sync()
+                        save_checkpoint(checkpoint_path, state)
+                    failures = 0
+                break
+            except mysql.connector.Error as err:
+                failures += 1
+                if failures > max_retries:
+                    raise
+                print(f"MySQL Error: {err}; resuming after batch {state['batch']}")
+                time.sleep(retry_delay * 2 ** (failures - 1))
+            finally:
+                if connection:
+                    connection.close()
+
+        writer.sync()
+    finally:
+        writer.close()
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return state["rows"]
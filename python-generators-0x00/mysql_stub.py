@@ -0,0 +1,34 @@
+"""A stand-in for mysql.connector so the tests run without the driver"""
+import sys
+import types
+
+
+def install():
+    """Registers a minimal mysql.connector unless the real one is installed"""
+    try:
+        import mysql.connector  # noqa: F401
+        return
+    except ImportError:
+        pass
+
+    class Error(Exception):
+        """Base class of the stub's errors, like mysql.connector.Error"""
+
+    class PoolError(Error):
+        """Raised by the stub's pool, like mysql.connector.errors.PoolError"""
+
+    def connect(**config):
+        raise Error("mysql.connector is not installed")
+
+    errors = types.ModuleType("mysql.connector.errors")
+    errors.Error = Error
+    errors.PoolError = PoolError
+    connector = types.ModuleType("mysql.connector")
+    connector.Error = Error
+    connector.errors = errors
+    connector.connect = connect
+    mysql = types.ModuleType("mysql")
+    mysql.connector = connector
+    sys.modules.update(
+        {"mysql": mysql, "mysql.connector": connector, "mysql.connector.errors": errors}
+    )
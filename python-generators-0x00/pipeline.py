@@ -0,0 +1,283 @@
+#!/usr/bin/python3
+"""
+Multi-stage generator pipelines connected by bounded queues.
+
+    Pipeline(batches.stream_users_in_batches(1000))
+        .map(enrich, workers=4, mode="process")
+        .filter(lambda user: user["age"] > 25)
+        .sink(print)
+        .run()
+
+Each stage runs on its own thread and can hand its work to a thread or
+process pool, so CPU-heavy stages overlap with the database reads.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+_DONE = object()
+
+
+class StageStats:
+    """Throughput and latency counters of one pipeline stage"""
+
+    __slots__ = (
+        "name",
+        "items_in",
+        "items_out",
+        "latency_total",
+        "latency_max",
+        "blocked_in",
+        "blocked_out",
+        "started",
+        "finished",
+    )
+
+    def __init__(self, name):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.blocked_in = 0.0
+        self.blocked_out = 0.0
+        self.started = None
+        self.finished = None
+
+    def record(self, latency):
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def to_dict(self):
+        """Snapshot of the counters, including throughput and mean latency"""
+        elapsed = 0.0
+        if self.started is not None:
+            elapsed = (self.finished or time.perf_counter()) - self.started
+        latency_avg = self.latency_total / self.items_in if self.items_in else 0.0
+        return {
+            "name": self.name,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "items_per_sec": self.items_out / elapsed if elapsed else 0.0,
+            "latency_avg": latency_avg,
+            "latency_max": self.latency_max,
+            "blocked_in": self.blocked_in,
+            "blocked_out": self.blocked_out,
+            "elapsed": elapsed,
+        }
+
+
+def _keep(predicate, item):
+    """Runs a filter predicate; module level so process pools can pickle it"""
+    return predicate(item)
+
+
+class _Stage:
+    def __init__(self, name, kind, fn, workers, mode):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.kind = kind
+        self.fn = fn
+        self.workers = workers
+        self.mode = mode
+        self.stats = StageStats(name)
+
+    def executor(self):
+        if self.workers <= 1 and self.mode == "thread":
+            return None
+        if self.mode == "process":
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+
+class Pipeline:
+    """
+    A source followed by map/filter stages and an optional sink.
+
+    Stages are connected by queues holding at most ``maxsize`` items, so a
+    slow stage holds back the ones before it instead of letting work pile
+    up in memory. Stages with ``workers > 1`` or ``mode="process"`` keep up
+    to two tasks per worker in flight and still emit items in order.
+    """
+
+    def __init__(self, source, maxsize=64, name="source"):
+        self.source = source
+        self.maxsize = maxsize
+        self.source_stats = StageStats(name)
+        self.stages = []
+        self._sink = None
+        self._stop = threading.Event()
+        self._error = None
+
+    def map(self, fn, workers=1, mode="thread", name=None):
+        """Adds a stage that replaces every item with ``fn(item)``"""
+        self.stages.append(_Stage(name or fn.__name__, "map", fn, workers, mode))
+        return self
+
+    def filter(self, predicate, workers=1, mode="thread", name=None):
+        """Adds a stage that drops items for which ``predicate`` is false"""
+        name = name or predicate.__name__
+        self.stages.append(_Stage(name, "filter", predicate, workers, mode))
+        return self
+
+    def sink(self, fn, name=None):
+        """Sends every item that comes out of the pipeline to ``fn``"""
+        self._sink = _Stage(name or fn.__name__, "sink", fn, 1, "thread")
+        return self
+
+    def stats(self):
+        """Per-stage counters, from the source to the sink"""
+        stages = [self.source_stats] + [stage.stats for stage in self.stages]
+        if self._sink:
+            stages.append(self._sink.stats)
+        return [stats.to_dict() for stats in stages]
+
+    def _put(self, q, item, stats):
+        started = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        stats.blocked_out += time.perf_counter() - started
+
+    def _get(self, q, stats):
+        started = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                item = q.get(timeout=0.1)
+                break
+            except queue.Empty:
+                continue
+        else:
+            item = _DONE
+        stats.blocked_in += time.perf_counter() - started
+        return item
+
+    def _fail(self, error):
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    def _run_source(self, out):
+        stats = self.source_stats
+        stats.started = time.perf_counter()
+        try:
+            for item in self.source:
+                if self._stop.is_set():
+                    break
+                stats.items_out += 1
+                self._put(out, item, stats)
+        except BaseException as error:
+            self._fail(error)
+        finally:
+            close = getattr(self.source, "close", None)
+            if close:
+                close()
+            stats.finished = time.perf_counter()
+            self._put(out, _DONE, stats)
+
+    def _emit(self, stage, item, result, out):
+        if stage.kind == "map":
+            stage.stats.items_out += 1
+            self._put(out, result, stage.stats)
+        elif result:
+            stage.stats.items_out += 1
+            self._put(out, item, stage.stats)
+
+    def _run_stage(self, stage, inp, out):
+        stats = stage.stats
+        stats.started = time.perf_counter()
+        executor = stage.executor()
+        try:
+            if executor is None:
+                for item in iter(lambda: self._get(inp, stats), _DONE):
+                    stats.items_in += 1
+                    started = time.perf_counter()
+                    result = stage.fn(item)
+                    stats.record(time.perf_counter() - started)
+                    if stage.kind == "sink":
+                        stats.items_out += 1
+                    else:
+                        self._emit(stage, item, result, out)
+            else:
+                in_flight = deque()
+                task = stage.fn if stage.kind == "map" else _keep
+                for item in iter(lambda: self._get(inp, stats), _DONE):
+                    stats.items_in += 1
+                    args = (item,) if stage.kind == "map" else (stage.fn, item)
+                    future = executor.submit(task, *args)
+                    in_flight.append((item, time.perf_counter(), future))
+                    while len(in_flight) > 2 * stage.workers or (
+                        in_flight and in_flight[0][2].done()
+                    ):
+                        self._collect(stage, in_flight, out)
+                while in_flight and not self._stop.is_set():
+                    self._collect(stage, in_flight, out)
+        except BaseException as error:
+            self._fail(error)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            stats.finished = time.perf_counter()
+            if out is not None:
+                self._put(out, _DONE, stats)
+
+    def _collect(self, stage, in_flight, out):
+        item, submitted, future = in_flight.popleft()
+        result = future.result()
+        stage.stats.record(time.perf_counter() - submitted)
+        self._emit(stage, item, result, out)
+
+    def _start(self):
+        queues = [queue.Queue(self.maxsize) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._run_source, args=(queues[0],))]
+        for index, stage in enumerate(self.stages):
+            threads.append(
+                threading.Thread(
+                    target=self._run_stage,
+                    args=(stage, queues[index], queues[index + 1]),
+                )
+            )
+        if self._sink:
+            threads.append(
+                threading.Thread(
+                    target=self._run_stage, args=(self._sink, queues[-1], None)
+                )
+            )
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        return queues[-1], threads
+
+    def __iter__(self):
+        """Runs the pipeline and yields what comes out of the last stage"""
+        if self._sink:
+            raise TypeError("A pipeline with a sink is consumed with run()")
+        out, threads = self._start()
+        stats = StageStats("output")
+        try:
+            for item in iter(lambda: self._get(out, stats), _DONE):
+                yield item
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def run(self):
+        """Runs the pipeline to completion and returns the per-stage stats"""
+        if self._sink:
+            _, threads = self._start()
+            for thread in threads:
+                thread.join()
+            if self._error is not None:
+                raise self._error
+        else:
+            for _ in self:
+                pass
+        return self.stats()
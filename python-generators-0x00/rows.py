@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+"""Compact row representations for the user_data streams"""
+import operator
+from array import array
+from collections import namedtuple
+from decimal import Decimal
+from itertools import compress, repeat
+
+ROW_MODES = ("dict", "tuple", "columnar")
+
+COMPARISONS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def open_cursor(connection, row_mode="dict", **options):
+    """Opens a cursor that returns dicts for "dict" mode and tuples otherwise"""
+    if row_mode not in ROW_MODES:
+        raise ValueError(f"Unknown row mode: {row_mode}")
+    return connection.cursor(dictionary=row_mode == "dict", **options)
+
+
+def close_cursor(connection, cursor):
+    """
+    Closes a streaming cursor without reading the rest of its result set.
+
+    Closing a cursor with rows still unread would fetch them all first, so
+    such a cursor is left alone: closing ``connection`` then drops it (a
+    pooled connection is discarded rather than returned).
+    """
+    if not connection.unread_result:
+        cursor.close()
+
+
+def _pack(values):
+    """Stores a column in a typed array when its values are all numbers"""
+    if values and all(type(value) is int for value in values):
+        return array("q", values)
+    if values and all(type(value) in (int, float, Decimal) for value in values):
+        return array("d", map(float, values))
+    return list(values)
+
+
+class ColumnBatch:
+    """
+    A chunk of rows stored column by column.
+
+    Numeric columns are packed into ``array`` objects, so a batch holds one
+    object per column instead of one per row, and filters run over whole
+    columns at once.
+    """
+
+    __slots__ = ("names", "columns")
+
+    def __init__(self, names, columns):
+        self.names = tuple(names)
+        self.columns = dict(zip(self.names, columns))
+
+    @classmethod
+    def from_rows(cls, names, rows):
+        columns = [_pack(list(values)) for values in zip(*rows)]
+        return cls(names, columns or [[] for _ in names])
+
+    def __len__(self):
+        return len(self.columns[self.names[0]]) if self.names else 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def rows(self):
+        """Iterates over the batch as plain tuples"""
+        return zip(*(self.columns[name] for name in self.names))
+
+    def filter(self, column, op, value):
+        """Returns a new batch with the rows where ``column op value`` holds"""
+        mask = list(map(COMPARISONS[op], self.columns[column], repeat(value)))
+        return ColumnBatch(
+            self.names,
+            [
+                _pack(list(compress(self.columns[name], mask)))
+                for name in self.names
+            ],
+        )
+
+
+def read_chunks(cursor, chunk_size, row_mode="dict"):
+    """
+    Reads the cursor ``chunk_size`` rows at a time.
+
+    Yields individual rows for "dict" and "tuple" mode (the latter as named
+    tuples sharing one class per query) and one ColumnBatch per chunk for
+    "columnar" mode.
+    """
+    names = tuple(cursor.column_names)
+    if row_mode == "tuple":
+        make = namedtuple("Row", names)._make
+    while True:
+        chunk = cursor.fetchmany(chunk_size)
+        if not chunk:
+            break
+        if row_mode == "dict":
+            yield from chunk
+        elif row_mode == "tuple":
+            yield from map(make, chunk)
+        else:
+            yield ColumnBatch.from_rows(names, chunk)
@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+"""Index management and query plan checks for user_data"""
+import mysql.connector
+
+seed = __import__("seed")
+batches = __import__("1-batch_processing")
+pages = __import__("2-lazy_paginate")
+ages = __import__("4-stream_ages")
+aggregates = __import__("aggregates")
+changes = __import__("changes")
+
+INDEXES = {
+    "idx_user_data_age": "(age)",
+    "idx_user_data_updated_at": "(updated_at, user_id)",
+}
+
+_ANY_ID = bytes(16)
+_ANY_TIME = "1970-01-02 00:00:00"
+_LOW, _HIGH = batches.key_ranges(16)[1]
+_RANGE = [("user_id", ">=", _LOW), ("user_id", "<", _HIGH)]
+_WATERMARK = (_ANY_TIME, _ANY_TIME, _ANY_ID)
+
+# (name, query, params, index the query is expected to use). Every query is
+# built exactly as the generator builds it. None means a full scan is the
+# right plan, e.g. for a filter that matches most of the table.
+GENERATOR_QUERIES = (
+    ("stream_user_ages", ages.AGES_QUERY, (), "idx_user_data_age"),
+    (
+        "average_age",
+        *aggregates.aggregate_query("age", ages.AVERAGE_AGE),
+        "idx_user_data_age",
+    ),
+    (
+        "batch_processing",
+        *batches.build_select(None, batches.BATCH_PROCESSING_WHERE),
+        None,
+    ),
+    ("seek_page", pages.SEEK_QUERY, (_ANY_ID, 1000), "PRIMARY"),
+    ("partition_range", *batches.build_select(None, _RANGE), "PRIMARY"),
+    (
+        "partition_page",
+        *batches.page_query(None, _RANGE, _ANY_ID, 1000),
+        "PRIMARY",
+    ),
+    (
+        "changes",
+        changes.CHANGES_QUERY,
+        _WATERMARK + (_ANY_TIME, 1000),
+        "idx_user_data_updated_at",
+    ),
+    (
+        "refresh_last_change",
+        aggregates.LAST_CHANGE_QUERY.format(
+            after=aggregates.AFTER_WATERMARK + " AND "
+        ),
+        _WATERMARK + (1000000,),
+        "idx_user_data_updated_at",
+    ),
+    (
+        "refresh_delta",
+        aggregates.stats_query(
+            "age", aggregates.AFTER_WATERMARK + " AND " + aggregates.UP_TO_WATERMARK
+        ),
+        _WATERMARK * 2,
+        "idx_user_data_updated_at",
+    ),
+    (
+        "refresh_row_count",
+        aggregates.ROW_COUNT_QUERY,
+        _WATERMARK,
+        "idx_user_data_updated_at",
+    ),
+)
+
+
+def ensure_indexes(connection):
+    """Adds any index in INDEXES that an existing user_data table lacks"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT DISTINCT index_name FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = 'user_data'"
+        )
+        existing = {name for (name,) in cursor.fetchall()}
+        for name, columns in INDEXES.items():
+            if name not in existing:
+                cursor.execute(f"CREATE INDEX {name} ON user_data {columns}")
+                print(f"Created index {name}")
+    except mysql.connector.Error as err:
+        print(f"Error creating indexes: {err}")
+    finally:
+        cursor.close()
+
+
+def explain(connection, query, params=()):
+    """Returns the EXPLAIN rows of a query as dicts"""
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(f"EXPLAIN {query}", params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def check_query_plans(connection, queries=GENERATOR_QUERIES):
+    """
+    Checks that each generator query is served by the index it relies on.
+
+    Prints one line per query and returns the names of the queries whose
+    plan is a full table scan or uses a different index. Queries expected
+    to scan the whole table are reported as "full scan" without failing.
+    """
+    failures = []
+    for name, query, params, expected in queries:
+        plan = explain(connection, query, params)[0]
+        key = plan.get("key")
+        if expected is None:
+            ok = True
+            status = "full scan" if plan.get("type") == "ALL" else "ok"
+        else:
+            ok = key == expected and plan.get("type") != "ALL"
+            status = "ok" if ok else "MISSING INDEX"
+        print(
+            f"{name:<16} {status:<14} type={plan.get('type')} key={key} "
+            f"extra={plan.get('Extra')}"
+        )
+        if not ok:
+            failures.append(name)
+    return failures
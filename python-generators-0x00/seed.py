@@ -2,6 +2,33 @@
 import uuid
 import mysql.connector
 import csv
+import io
+import mmap
+import os
+import threading
+import time
+from collections import deque
+from functools import partial
+from itertools import islice
+
+pipeline = __import__("pipeline")
+
+USER_COLUMNS = ("name", "email", "age")
+USER_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, "user_data.alx_prodev")
+
+USER_DATA_DDL = """
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id BINARY(16) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    age DECIMAL(3, 0) NOT NULL,
+    updated_at TIMESTAMP(6) NOT NULL
+        DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    PRIMARY KEY (user_id),
+    INDEX idx_user_data_age (age),
+    INDEX idx_user_data_updated_at (updated_at, user_id)
+)
+"""
 
 
 def connect_db():
@@ -28,35 +55,287 @@ def create_database(connection):
         cursor.close()
 
 
-def connect_to_prodev():
-    """Connects the ALX_prodev database in MySQL"""
-    try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="username",
-            password="password",
-            database="ALX_prodev",
-        )
+PRODEV_CONFIG = {
+    "host": "localhost",
+    "user": "username",
+    "password": "password",
+    "database": "ALX_prodev",
+}
+
+POOL_OPTIONS = {
+    "min_size": 1,
+    "max_size": 10,
+    "timeout": 30.0,
+    "idle_timeout": 300.0,
+    "health_check_interval": 30.0,
+}
+
+
+class PooledConnection:
+    """
+    A connection borrowed from a ConnectionPool.
+
+    Behaves like the underlying MySQL connection, except that close() hands
+    it back to the pool instead of disconnecting.
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        """Returns the connection to the pool"""
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection)
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of MySQL connections.
+
+    Keeps between ``min_size`` and ``max_size`` connections. Idle
+    connections are pinged before reuse once they have been idle for
+    ``health_check_interval`` seconds, and closed after ``idle_timeout``
+    seconds (down to ``min_size``). acquire() waits up to ``timeout``
+    seconds for a free connection; the time spent waiting is recorded in
+    metrics().
+    """
+
+    def __init__(
+        self,
+        config,
+        min_size=1,
+        max_size=10,
+        timeout=30.0,
+        idle_timeout=300.0,
+        health_check_interval=30.0,
+    ):
+        self.config = dict(config)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._stats = {
+            "created": 0,
+            "reused": 0,
+            "discarded": 0,
+            "evicted": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "wait_time": 0.0,
+            "max_wait": 0.0,
+        }
+        for _ in range(min_size):
+            self._size += 1
+            self._idle.append((self._open(), time.monotonic()))
+
+    def _open(self):
+        connection = mysql.connector.connect(**self.config)
+        with self._condition:
+            self._stats["created"] += 1
         return connection
+
+    @staticmethod
+    def _disconnect(connection):
+        try:
+            connection.close()
+        except mysql.connector.Error:
+            pass
+
+    def _evict_idle(self, now):
+        """
+        Takes connections idle for too long out of the pool.
+
+        Called with the lock held; returns the evicted connections so the
+        caller can disconnect them once it has released the lock.
+        """
+        evicted = []
+        while self._idle and self._size > self.min_size:
+            connection, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            self._stats["evicted"] += 1
+            evicted.append(connection)
+        return evicted
+
+    def _record_wait(self, waited):
+        """Adds one acquire's wait to the metrics; called with the lock held"""
+        if waited > 0.001:
+            self._stats["waits"] += 1
+            self._stats["wait_time"] += waited
+            self._stats["max_wait"] = max(self._stats["max_wait"], waited)
+
+    def acquire(self, timeout=None):
+        """Borrows a connection, opening a new one if none is idle"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        connection = None
+        evicted = []
+        try:
+            with self._condition:
+                if self._closed:
+                    raise mysql.connector.errors.PoolError("Pool is closed")
+                while True:
+                    now = time.monotonic()
+                    evicted += self._evict_idle(now)
+                    if self._idle:
+                        connection, last_used = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    if now >= deadline:
+                        self._stats["timeouts"] += 1
+                        self._record_wait(now - started)
+                        raise mysql.connector.errors.PoolError(
+                            f"No connection available after {timeout}s"
+                        )
+                    self._condition.wait(deadline - now)
+                self._record_wait(time.monotonic() - started)
+        finally:
+            for stale in evicted:
+                self._disconnect(stale)
+
+        try:
+            if connection is not None:
+                stale = time.monotonic() - last_used >= self.health_check_interval
+                if stale and not connection.is_connected():
+                    self._disconnect(connection)
+                    connection = None
+                    with self._condition:
+                        self._stats["discarded"] += 1
+                else:
+                    with self._condition:
+                        self._stats["reused"] += 1
+            if connection is None:
+                connection = self._open()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        return PooledConnection(self, connection)
+
+    def release(self, connection):
+        """
+        Takes a connection back, discarding it if it is no longer usable.
+
+        A connection with an unread result set (a streaming cursor that was
+        abandoned early) is discarded too: draining it could mean reading
+        the rest of a multi-million-row table.
+        """
+        try:
+            reusable = not self._closed and not connection.unread_result
+            if reusable:
+                connection.rollback()
+        except mysql.connector.Error:
+            reusable = False
+
+        with self._condition:
+            if reusable:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._size -= 1
+                self._stats["discarded"] += 1
+            self._condition.notify()
+        if not reusable:
+            self._disconnect(connection)
+
+    def close(self):
+        """Closes every idle connection; borrowed ones close when returned"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, deque()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for connection, _ in idle:
+            self._disconnect(connection)
+
+    def metrics(self):
+        """Returns a snapshot of the pool's size and wait statistics"""
+        with self._condition:
+            metrics = dict(self._stats)
+            metrics["size"] = self._size
+            metrics["idle"] = len(self._idle)
+            metrics["in_use"] = self._size - len(self._idle)
+        metrics["avg_wait"] = (
+            metrics["wait_time"] / metrics["waits"] if metrics["waits"] else 0.0
+        )
+        return metrics
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure_pool(**options):
+    """Changes the pool settings (see POOL_OPTIONS) and drops the current pool"""
+    global _pool
+    unknown = set(options) - set(POOL_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown pool options: {sorted(unknown)}")
+    with _pool_lock:
+        POOL_OPTIONS.update(options)
+        pool, _pool = _pool, None
+    if pool:
+        pool.close()
+
+
+def get_pool():
+    """Returns the shared ALX_prodev connection pool, creating it if needed"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(PRODEV_CONFIG, **POOL_OPTIONS)
+        return _pool
+
+
+def connect_to_prodev(**options):
+    """Connects the ALX_prodev database in MySQL
+
+    The connection is borrowed from the shared pool; closing it returns it
+    to the pool. Extra keyword arguments, e.g. ``allow_local_infile=True``
+    for load_data_infile, are passed on to mysql.connector.connect and give
+    a dedicated connection outside the pool.
+    """
+    try:
+        if options:
+            return mysql.connector.connect(**dict(PRODEV_CONFIG, **options))
+        return get_pool().acquire()
     except mysql.connector.Error as err:
         print(f"Failed to connect to database: {err}")
         return None
 
 
 def create_table(connection):
-    """Creates a table user_data"""
-    cursor = connection.cursor()
-    query = """
-    CREATE TABLE IF NOT EXISTS user_data (
-        user_id (Primary Key, UUID),
-        name (VARCHAR, NOT NULL),
-        email (VARCHAR, NOT NULL),
-        age (DECIMAL, NOT NULL)),
-        INDEX (user_id)
-    )
+    """Creates a table user_data
+
+    user_id is a UUID stored as BINARY(16). It is the clustered primary key
+    that the seek pagination walks. The age index covers the age queries,
+    and the updated_at index serves the change stream.
     """
+    cursor = connection.cursor()
     try:
-        cursor.execute(query)
+        cursor.execute(USER_DATA_DDL)
         connection.commit()
         print("Table user_data created successfully")
     except mysql.connector.Error as err:
@@ -70,7 +349,7 @@ def insert_table(connection, data):
         with open(data, mode="r", encoding="utf-8") as file:
             reader = csv.DictReader(file)
             for row in reader:
-                user_id = str(uuid.uuid4())
+                user_id = uuid.uuid4().bytes
                 name = row["name"]
                 email = row["email"]
                 age = int(row["age"])
@@ -89,3 +368,199 @@ def insert_table(connection, data):
         print(f"MySQL Error: {err}")
     finally:
         cursor.close()
+
+
+def read_csv_chunks(data, chunk_size):
+    """Yields the rows of the CSV file as lists of (name, email, age) tuples"""
+    with open(data, mode="r", encoding="utf-8", newline="") as file:
+        reader = csv.DictReader(file)
+        while True:
+            chunk = [
+                (row["name"], row["email"], int(row["age"]))
+                for row in islice(reader, chunk_size)
+            ]
+            if not chunk:
+                break
+            yield chunk
+
+
+def csv_byte_ranges(data, chunk_bytes):
+    """
+    Splits the CSV file into byte ranges that start and end on line breaks.
+
+    Returns the header fields and a list of ``(start, end)`` offsets that
+    together cover every data row. Quoted fields spanning several lines are
+    not supported.
+    """
+    with open(data, mode="rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return [], []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            header_end = mm.find(b"\n")
+            header_end = size if header_end == -1 else header_end + 1
+            header = next(csv.reader([mm[:header_end].decode("utf-8-sig")]), [])
+            ranges = []
+            start = header_end
+            while start < size:
+                end = mm.find(b"\n", min(start + chunk_bytes, size) - 1)
+                end = size if end == -1 else end + 1
+                ranges.append((start, end))
+                start = end
+    return header, ranges
+
+
+def _parse_csv_range(data, header, byte_range):
+    """Parses one byte range of the CSV file into (name, email, age) tuples"""
+    name, email, age = (header.index(column) for column in USER_COLUMNS)
+    start, end = byte_range
+    with open(data, mode="rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = mm[start:end].decode("utf-8")
+    return [
+        (row[name], row[email], int(row[age]))
+        for row in csv.reader(io.StringIO(text, newline=""))
+        if row
+    ]
+
+
+def read_csv_parallel(data, workers=None, chunk_bytes=1 << 22):
+    """
+    Yields the rows of the CSV file, parsed in a process pool.
+
+    The memory-mapped file is cut into ``chunk_bytes`` ranges on line
+    boundaries. Each range is parsed by a worker process, and the results
+    come back in file order through a bounded queue. Yields lists of
+    (name, email, age) tuples, one per range.
+    """
+    header, ranges = csv_byte_ranges(data, chunk_bytes)
+    if not ranges:
+        return
+    workers = workers or os.cpu_count() or 1
+    parse = partial(_parse_csv_range, data, header)
+    yield from pipeline.Pipeline(ranges, maxsize=2 * workers).map(
+        parse, workers=workers, mode="process", name="parse_csv"
+    )
+
+
+def report_throughput(rows, started):
+    """Prints how many rows were loaded and at what rate"""
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed > 0 else 0.0
+    print(f"Loaded {rows} rows in {elapsed:.2f}s ({rate:.0f} rows/s)")
+
+
+def user_id_for(email):
+    """Derives a stable user_id (UUIDv5, as 16 bytes) from the user's email"""
+    return uuid.uuid5(USER_ID_NAMESPACE, email.strip().lower()).bytes
+
+
+def insert_table_bulk(connection, data, batch_size=1000, upsert=False, workers=None):
+    """
+    Loads the CSV file into user_data with batched multi-row inserts.
+
+    The file is streamed ``batch_size`` rows at a time, each chunk is sent
+    as one multi-row INSERT and committed on its own. Each row gets a
+    random UUID, so keys stay spread evenly over the key space.
+
+    With ``upsert=True`` the user_id is derived from the email instead and
+    rows that already exist are updated in place, so loading the same file
+    again only touches the rows that changed.
+
+    With ``workers`` set, the CSV is parsed by that many processes (see
+    read_csv_parallel) while this process inserts.
+    Returns the number of rows read from the file.
+    """
+    query = """
+    INSERT INTO user_data (user_id, name, email, age)
+    VALUES (%s, %s, %s, %s)
+    """
+    if upsert:
+        # Row alias form (MySQL 8.0.19+); VALUES(col) here is deprecated
+        query += """
+        AS new
+        ON DUPLICATE KEY UPDATE
+            name = new.name, email = new.email, age = new.age
+        """
+    cursor = connection.cursor()
+    total = 0
+    changed = 0
+    started = time.perf_counter()
+    if workers:
+        parsed = read_csv_parallel(data, workers)
+    else:
+        parsed = read_csv_chunks(data, batch_size)
+    try:
+        for chunk in (
+            rows[i:i + batch_size]
+            for rows in parsed
+            for i in range(0, len(rows), batch_size)
+        ):
+            if upsert:
+                chunk = [(user_id_for(row[1]),) + row for row in chunk]
+            else:
+                chunk = [(uuid.uuid4().bytes,) + row for row in chunk]
+            cursor.executemany(query, chunk)
+            connection.commit()
+            total += len(chunk)
+            changed += max(cursor.rowcount, 0)
+            report_throughput(total, started)
+        if upsert:
+            print(f"Affected rows: {changed}")
+    except FileNotFoundError:
+        print(f"Error: File '{data}' not found.")
+    except mysql.connector.Error as err:
+        connection.rollback()
+        print(f"MySQL Error: {err}")
+    finally:
+        cursor.close()
+    return total
+
+
+def load_data_infile(connection, data):
+    """
+    Loads the CSV file into user_data with LOAD DATA LOCAL INFILE.
+
+    This is the fastest path, but both the server (local_infile=ON) and the
+    connection (connect_to_prodev(allow_local_infile=True)) must allow it.
+    user_ids are RANDOM_BYTES(16), like the uuid4 keys the other writers
+    use, so they spread evenly over key_ranges' partitions; MySQL's UUID()
+    is time-based and would put nearly every row in the same one.
+    Returns the number of rows loaded.
+    """
+    try:
+        with open(data, mode="r", encoding="utf-8", newline="") as file:
+            header = next(csv.reader(file), [])
+    except FileNotFoundError:
+        print(f"Error: File '{data}' not found.")
+        return 0
+
+    if sorted(header) != sorted(USER_COLUMNS):
+        print(f"Error: unexpected CSV header {header}")
+        return 0
+
+    variables = ", ".join(f"@{column}" for column in header)
+    assignments = ", ".join(f"{column} = @{column}" for column in USER_COLUMNS)
+    query = f"""
+    LOAD DATA LOCAL INFILE %s INTO TABLE user_data
+    FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+    LINES TERMINATED BY '\\n'
+    IGNORE 1 LINES
+    ({variables})
+    SET user_id = RANDOM_BYTES(16), {assignments}
+    """
+
+    cursor = connection.cursor()
+    total = 0
+    started = time.perf_counter()
+    try:
+        cursor.execute(query, (data,))
+        connection.commit()
+        total = cursor.rowcount
+        report_throughput(total, started)
+    except mysql.connector.Error as err:
+        connection.rollback()
+        print(f"MySQL Error: {err}")
+    finally:
+        cursor.close()
+    return total
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tests for the aggregates.py file
+"""
+import io
+import os
+import statistics
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+from mysql_stub import install
+
+install()
+aggregates = __import__("aggregates")
+
+VALUES = [23, 35.5, 41, 18, 90, 67, 52.25, 29, 33, 61]
+
+
+class TestOnlineStats(unittest.TestCase):
+    """Tests for OnlineStats"""
+
+    def assertMatchesValues(self, stats, values):
+        self.assertEqual(stats.count, len(values))
+        self.assertAlmostEqual(stats.total, sum(values))
+        self.assertAlmostEqual(stats.mean, statistics.fmean(values))
+        self.assertAlmostEqual(stats.variance, statistics.pvariance(values))
+        self.assertAlmostEqual(stats.stddev, statistics.pstdev(values))
+        self.assertEqual((stats.min, stats.max), (min(values), max(values)))
+
+    def test_single_pass(self):
+        """Adding values one by one gives the textbook statistics"""
+        stats = aggregates.OnlineStats()
+        for value in VALUES:
+            stats.add(value)
+        self.assertMatchesValues(stats, VALUES)
+
+    def test_merge_matches_single_pass(self):
+        """Merging two partial results equals one pass over all values"""
+        for split in range(len(VALUES) + 1):
+            left, right = aggregates.OnlineStats(), aggregates.OnlineStats()
+            for value in VALUES[:split]:
+                left.add(value)
+            for value in VALUES[split:]:
+                right.add(value)
+            self.assertMatchesValues(left.merge(right), VALUES)
+
+    def test_empty(self):
+        """An empty OnlineStats has no variance or standard deviation"""
+        stats = aggregates.OnlineStats()
+        self.assertIsNone(stats.variance)
+        self.assertIsNone(stats.stddev)
+        self.assertEqual(stats.merge(aggregates.OnlineStats()).count, 0)
+
+    def test_round_trip(self):
+        """to_dict/from_dict keep every statistic"""
+        stats = aggregates.OnlineStats()
+        for value in VALUES:
+            stats.add(value)
+        copy = aggregates.OnlineStats.from_dict(stats.to_dict())
+        self.assertMatchesValues(copy, VALUES)
+
+
+class TestQuantileSketch(unittest.TestCase):
+    """Tests for QuantileSketch"""
+
+    def test_exact_while_sample_fits(self):
+        """Quantiles are exact while every value fits in the reservoir"""
+        sketch = aggregates.QuantileSketch(size=100, seed=1)
+        for value in range(100):
+            sketch.add(value)
+        self.assertEqual(sketch.quantile(0.5), 50)
+        self.assertEqual(sketch.quantile(1), 99)
+
+    def test_sample_stays_bounded(self):
+        """The reservoir never grows past ``size`` and stays representative"""
+        sketch = aggregates.QuantileSketch(size=500, seed=1)
+        for value in range(100000):
+            sketch.add(value)
+        self.assertEqual(len(sketch.sample), 500)
+        self.assertAlmostEqual(sketch.quantile(0.5), 50000, delta=7500)
+
+    def test_empty(self):
+        """An empty sketch has no quantiles"""
+        self.assertIsNone(aggregates.QuantileSketch().quantile(0.5))
+
+
+class TestRefreshAggregate(unittest.TestCase):
+    """Tests for refresh_aggregate with a scripted connection"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.directory.name, "state.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def refresh(self, *results):
+        """Runs refresh_aggregate with the cursor returning ``results``"""
+        connection = Mock()
+        connection.cursor.return_value.fetchone.side_effect = list(results)
+        output = io.StringIO()
+        with patch.object(
+            aggregates.seed, "connect_to_prodev", return_value=connection
+        ), redirect_stdout(output):
+            stats = aggregates.refresh_aggregate(self.state_path)
+        return stats, output.getvalue()
+
+    def test_inserts_are_merged(self):
+        """New rows are merged into the stored statistics"""
+        stats, _ = self.refresh(
+            (datetime(2024, 1, 1), b"a" * 16), (2, 30, 15, 25, 10, 20), (2,)
+        )
+        stats, output = self.refresh(
+            (datetime(2024, 1, 2), b"b" * 16), (1, 30, 30, 0, 30, 30), (3,)
+        )
+        self.assertEqual(output, "")
+        self.assertEqual(stats.count, 3)
+        self.assertAlmostEqual(stats.mean, 20)
+        self.assertAlmostEqual(stats.variance, statistics.pvariance([10, 20, 30]))
+
+    def test_updated_rows_trigger_a_recompute(self):
+        """A merged count that disagrees with the table is recomputed"""
+        self.refresh((datetime(2024, 1, 1), b"a" * 16), (2, 30, 15, 25, 10, 20), (2,))
+        # the row aged 10 was updated to 40, so it shows up as a new row
+        stats, output = self.refresh(
+            (datetime(2024, 1, 2), b"a" * 16),
+            (1, 40, 40, 0, 40, 40),
+            (2,),
+            (2, 60, 30, 100, 20, 40),
+        )
+        self.assertIn("recomputing age statistics", output)
+        self.assertEqual(stats.count, 2)
+        self.assertAlmostEqual(stats.mean, 30)
+        self.assertAlmostEqual(stats.variance, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
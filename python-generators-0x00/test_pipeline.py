@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the pipeline.py file
+"""
+import operator
+import random
+import threading
+import time
+import unittest
+
+pipeline = __import__("pipeline")
+
+
+def jittered(value):
+    """Returns ``value`` after a short random delay, to reorder completions"""
+    time.sleep(random.uniform(0, 0.005))
+    return value * 2
+
+
+class TestPipeline(unittest.TestCase):
+    """Tests for Pipeline"""
+
+    def test_pooled_thread_stage_keeps_order(self):
+        """A map stage with several threads emits items in input order"""
+        out = list(pipeline.Pipeline(range(200), maxsize=4).map(jittered, workers=8))
+        self.assertEqual(out, [value * 2 for value in range(200)])
+
+    def test_pooled_process_stage_keeps_order(self):
+        """A process-pool map stage emits items in input order"""
+        out = list(
+            pipeline.Pipeline(range(100)).map(operator.neg, workers=2, mode="process")
+        )
+        self.assertEqual(out, [-value for value in range(100)])
+
+    def test_filter_and_sink(self):
+        """Filters drop items and the sink sees the rest, in order"""
+        seen = []
+        stats = (
+            pipeline.Pipeline(range(20))
+            .filter(lambda value: value % 3 == 0, workers=3)
+            .sink(seen.append)
+            .run()
+        )
+        self.assertEqual(seen, [0, 3, 6, 9, 12, 15, 18])
+        self.assertEqual([stage["items_out"] for stage in stats], [20, 7, 7])
+
+    def test_source_error_is_raised(self):
+        """An exception in the source comes out of the consumer"""
+
+        def source():
+            yield 1
+            raise ValueError("source failed")
+
+        with self.assertRaisesRegex(ValueError, "source failed"):
+            list(pipeline.Pipeline(source()).map(str))
+
+    def test_stage_error_is_raised(self):
+        """An exception in a pooled stage comes out of the consumer"""
+
+        def explode(value):
+            if value == 50:
+                raise ValueError("stage failed")
+            return value
+
+        with self.assertRaisesRegex(ValueError, "stage failed"):
+            list(pipeline.Pipeline(range(1000), maxsize=2).map(explode, workers=4))
+
+    def test_sink_error_is_raised(self):
+        """An exception in the sink comes out of run()"""
+
+        def sink(value):
+            raise ValueError("sink failed")
+
+        with self.assertRaisesRegex(ValueError, "sink failed"):
+            pipeline.Pipeline(range(1000), maxsize=2).map(str).sink(sink).run()
+
+    def test_early_exit_stops_and_closes_source(self):
+        """Leaving the loop early stops the source and closes it"""
+        produced = []
+        closed = threading.Event()
+
+        def source():
+            try:
+                for value in range(10**6):
+                    produced.append(value)
+                    yield value
+            finally:
+                closed.set()
+
+        items = iter(pipeline.Pipeline(source(), maxsize=2).map(str))
+        self.assertEqual([next(items) for _ in range(3)], ["0", "1", "2"])
+        items.close()
+        self.assertTrue(closed.wait(2))
+        self.assertLess(len(produced), 100)
+
+    def test_sink_pipeline_cannot_be_iterated(self):
+        """A pipeline with a sink is only run with run()"""
+        with self.assertRaises(TypeError):
+            iter(pipeline.Pipeline([]).sink(print)).__next__()
+
+    def test_unknown_mode(self):
+        """Stages only run on threads or processes"""
+        with self.assertRaises(ValueError):
+            pipeline.Pipeline([]).map(str, mode="fiber")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the rows.py file
+"""
+import unittest
+from array import array
+from decimal import Decimal
+from unittest.mock import Mock
+
+rows = __import__("rows")
+
+NAMES = ("user_id", "name", "age")
+USERS = [
+    (b"\x01", "Ann", 25),
+    (b"\x02", "Bob", 40),
+    (b"\x03", "Cid", 18),
+    (b"\x04", "Dee", 40),
+]
+
+
+class TestColumnBatch(unittest.TestCase):
+    """Tests for ColumnBatch"""
+
+    def setUp(self):
+        self.batch = rows.ColumnBatch.from_rows(NAMES, USERS)
+
+    def test_packs_numeric_columns(self):
+        """Integer columns become "q" arrays, others stay lists"""
+        self.assertEqual(len(self.batch), 4)
+        self.assertEqual(self.batch["age"], array("q", [25, 40, 18, 40]))
+        self.assertEqual(self.batch["name"], ["Ann", "Bob", "Cid", "Dee"])
+        self.assertEqual(list(self.batch.rows()), USERS)
+
+    def test_mixed_numbers_are_packed_as_doubles(self):
+        """Columns mixing ints, floats and Decimals become "d" arrays"""
+        batch = rows.ColumnBatch.from_rows(("age",), [(1,), (2.5,), (Decimal("3.25"),)])
+        self.assertEqual(batch["age"], array("d", [1.0, 2.5, 3.25]))
+
+    def test_filter_each_operator(self):
+        """filter keeps the rows where the comparison holds, in order"""
+        cases = {
+            "=": [1, 3],
+            "!=": [0, 2],
+            "<": [0, 2],
+            "<=": [0, 1, 2, 3],
+            ">": [],
+            ">=": [1, 3],
+        }
+        for op, indexes in cases.items():
+            with self.subTest(op=op):
+                batch = self.batch.filter("age", op, 40)
+                self.assertEqual(list(batch.rows()), [USERS[i] for i in indexes])
+                if indexes:
+                    self.assertIsInstance(batch["age"], array)
+
+    def test_filter_on_a_text_column(self):
+        """Non-numeric columns can be filtered too"""
+        batch = self.batch.filter("name", ">", "Bob")
+        self.assertEqual(list(batch.rows()), USERS[2:])
+
+    def test_empty_result(self):
+        """A filter matching nothing gives an empty batch with the same names"""
+        batch = self.batch.filter("age", ">", 100)
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(batch.names, NAMES)
+        self.assertEqual(list(batch.rows()), [])
+
+    def test_unknown_operator(self):
+        """Only the comparisons in COMPARISONS are accepted"""
+        with self.assertRaises(KeyError):
+            self.batch.filter("age", "LIKE", 40)
+
+
+class TestReadChunks(unittest.TestCase):
+    """Tests for read_chunks"""
+
+    def cursor(self):
+        cursor = Mock(column_names=NAMES)
+        cursor.fetchmany.side_effect = [USERS[:3], USERS[3:], []]
+        return cursor
+
+    def test_tuple_mode(self):
+        """Tuple mode yields named tuples"""
+        out = list(rows.read_chunks(self.cursor(), 3, row_mode="tuple"))
+        self.assertEqual(out, USERS)
+        self.assertEqual(out[0].name, "Ann")
+
+    def test_columnar_mode(self):
+        """Columnar mode yields one ColumnBatch per chunk"""
+        out = list(rows.read_chunks(self.cursor(), 3, row_mode="columnar"))
+        self.assertEqual([len(batch) for batch in out], [3, 1])
+        self.assertEqual([row for batch in out for row in batch.rows()], USERS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the CSV readers in the seed.py file
+"""
+import os
+import tempfile
+import unittest
+
+from mysql_stub import install
+
+install()
+seed = __import__("seed")
+
+ROWS = [
+    ("Johnnie Mayer", "Ross.Reynolds21@hotmail.com", 35),
+    ("Myrtle Waters", "Edmund_Funk@gmail.com", 99),
+    ('Smith, "Jr."', "smith@example.com", 7),
+    ("Zoë Ångström", "zoe@example.com", 120),
+] * 25
+
+
+class CsvTestCase(unittest.TestCase):
+    """Writes a users CSV with CRLF line endings to a temporary file"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "user_data.csv")
+        self.write(ROWS)
+
+    def write(self, rows, ending="\r\n"):
+        lines = ["name,email,age"]
+        for name, email, age in rows:
+            name = '"{}"'.format(name.replace('"', '""')) if "," in name else name
+            lines.append(f"{name},{email},{age}")
+        with open(self.path, "w", encoding="utf-8", newline="") as file:
+            file.write(ending.join(lines) + ending if rows else "")
+
+
+class TestCsvByteRanges(CsvTestCase):
+    """Tests for csv_byte_ranges"""
+
+    def test_ranges_cover_the_rows_on_line_boundaries(self):
+        """Ranges are contiguous, end after a line break and reach the end"""
+        with open(self.path, "rb") as file:
+            content = file.read()
+        for chunk_bytes in (1, 7, 64, 1 << 20):
+            header, ranges = seed.csv_byte_ranges(self.path, chunk_bytes)
+            self.assertEqual(header, ["name", "email", "age"])
+            self.assertEqual(ranges[0][0], content.index(b"\n") + 1)
+            self.assertEqual(ranges[-1][1], len(content))
+            for (_, end), (start, _) in zip(ranges, ranges[1:]):
+                self.assertEqual(end, start)
+            for start, end in ranges:
+                self.assertEqual(content[end - 2:end], b"\r\n")
+
+    def test_empty_file(self):
+        """An empty file has no header and no ranges"""
+        self.write([])
+        self.assertEqual(seed.csv_byte_ranges(self.path, 64), ([], []))
+
+
+class TestReadCsvParallel(CsvTestCase):
+    """Tests for read_csv_parallel"""
+
+    def flatten(self, chunks):
+        return [row for chunk in chunks for row in chunk]
+
+    def test_matches_serial_reader(self):
+        """Parallel parsing yields the same rows, in order, as the serial reader"""
+        serial = self.flatten(seed.read_csv_chunks(self.path, 10))
+        self.assertEqual(serial, ROWS)
+        for chunk_bytes in (1, 7, 64):
+            with self.subTest(chunk_bytes=chunk_bytes):
+                parallel = seed.read_csv_parallel(
+                    self.path, workers=2, chunk_bytes=chunk_bytes
+                )
+                self.assertEqual(self.flatten(parallel), serial)
+
+    def test_last_line_without_line_break(self):
+        """A final row with no trailing line break is still read"""
+        with open(self.path, "rb+") as file:
+            file.truncate(os.path.getsize(self.path) - 2)
+        parallel = seed.read_csv_parallel(self.path, workers=2, chunk_bytes=64)
+        self.assertEqual(self.flatten(parallel), ROWS)
+
+    def test_empty_file(self):
+        """An empty file yields nothing"""
+        self.write([])
+        self.assertEqual(list(seed.read_csv_parallel(self.path, workers=2)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()